@@ -40,10 +40,176 @@ var __importStar = (this && this.__importStar) || (function () {
 })();
 Object.defineProperty(exports, "__esModule", ({ value: true }));
 exports.activate = activate;
+exports.deactivate = deactivate;
 const vscode = __importStar(__webpack_require__(1));
 const child_process_1 = __webpack_require__(2);
-const path = __importStar(__webpack_require__(3));
-const fs = __importStar(__webpack_require__(4));
+const readline = __importStar(__webpack_require__(3));
+const path = __importStar(__webpack_require__(4));
+const fs = __importStar(__webpack_require__(5));
+// Long-lived analyzers started with --daemon, one per watched folder and tier, shared by every panel watching it
+class ComplexityDaemon {
+    folderPath;
+    onStop;
+    process;
+    nextId = 1;
+    pending = new Map();
+    ready;
+    failReady;
+    listeners = new Set();
+    saveListener;
+    stderrTail = '';
+    failure;
+    disposed = false;
+    constructor(pythonScript, folderPath, tier, onStop) {
+        this.folderPath = folderPath;
+        this.onStop = onStop;
+        this.process = (0, child_process_1.spawn)('python', [pythonScript, '--daemon', '--tier', tier, folderPath]);
+        const lines = readline.createInterface({ input: this.process.stdout });
+        let markReady;
+        this.ready = new Promise((resolve, reject) => { markReady = resolve; this.failReady = reject; });
+        this.ready.catch(() => undefined); // failures reach callers through request()
+        lines.on('line', line => {
+            let message;
+            try {
+                message = JSON.parse(line);
+            }
+            catch {
+                console.log(`complexity daemon: ${line}`); // stray prints and warnings are not protocol messages
+                return;
+            }
+            if (message.method === 'ready') {
+                markReady();
+            }
+            else if (message.method === 'reportChanged') {
+                this.broadcast(message.params);
+            }
+            else if (message.id !== undefined && this.pending.has(message.id)) {
+                this.pending.get(message.id)(message);
+                this.pending.delete(message.id);
+            }
+        });
+        this.process.stderr.on('data', data => {
+            console.log(data.toString());
+            this.stderrTail = (this.stderrTail + data.toString()).slice(-2000);
+        });
+        this.process.stdin.on('error', () => undefined); // writes after a crash; reported through 'exit'
+        this.process.on('error', error => this.fail(error));
+        this.process.on('exit', (code, signal) => {
+            const reason = signal ? `killed by ${signal}` : `exited with code ${code}`;
+            const detail = this.stderrTail.trim().split('\n').pop();
+            this.fail(new Error(`Complexity watcher ${reason}${detail ? `: ${detail}` : ''}`));
+        });
+        // One refresh per save, whatever the number of panels; notebooks are saved as notebook documents
+        const folderPrefix = path.join(this.folderPath, path.sep);
+        const refresh = async (uri) => {
+            if (uri.scheme === 'file' && /\.(py|ipynb)$/.test(uri.fsPath) && uri.fsPath.startsWith(folderPrefix)) {
+                try {
+                    this.broadcast(await this.request('refresh', { paths: [uri.fsPath] }));
+                }
+                catch (err) {
+                    console.log(`complexity daemon refresh failed: ${err instanceof Error ? err.message : err}`);
+                }
+            }
+        };
+        this.saveListener = vscode.Disposable.from(vscode.workspace.onDidSaveTextDocument(document => refresh(document.uri)), vscode.workspace.onDidSaveNotebookDocument(notebook => refresh(notebook.uri)));
+    }
+    get failed() {
+        return this.failure !== undefined;
+    }
+    async request(method, params = {}) {
+        if (this.failure) {
+            throw this.failure;
+        }
+        await this.ready;
+        const id = this.nextId++;
+        return new Promise((resolve, reject) => {
+            this.pending.set(id, message => message.error ? reject(new Error(message.error.message)) : resolve(message.result));
+            this.process.stdin.write(JSON.stringify({ jsonrpc: '2.0', id, method, params }) + '\n');
+        });
+    }
+    // Register a panel for reportChanged deltas; the daemon stops once the last panel unsubscribes
+    subscribe(listener) {
+        this.listeners.add(listener);
+        return () => {
+            this.listeners.delete(listener);
+            if (this.listeners.size === 0) {
+                this.dispose();
+            }
+        };
+    }
+    broadcast(delta) {
+        this.listeners.forEach(listener => listener(delta));
+    }
+    fail(error) {
+        if (this.failure) {
+            return;
+        }
+        this.failure = error;
+        this.failReady(error);
+        this.pending.forEach(callback => callback({ error: { message: error.message } }));
+        this.pending.clear();
+        this.saveListener.dispose();
+        this.onStop();
+        if (!this.disposed) {
+            vscode.window.showErrorMessage(error.message);
+        }
+    }
+    dispose() {
+        if (this.disposed) {
+            return;
+        }
+        this.disposed = true;
+        this.saveListener.dispose();
+        this.onStop();
+        if (!this.failure) {
+            this.process.stdin.write(JSON.stringify({ jsonrpc: '2.0', id: this.nextId++, method: 'shutdown' }) + '\n');
+            this.process.stdin.end();
+        }
+    }
+}
+const daemons = new Map();
+function analysisTier() {
+    return vscode.workspace.getConfiguration('codeAnalyzer').get('analysisTier', 'full');
+}
+// Pages, chunks and clones.json all sit directly in the report folder; the webview only names them
+function reportFile(reportDir, name) {
+    return path.join(reportDir, path.basename(name));
+}
+function readIndexPage(reportDir, page) {
+    return JSON.parse(fs.readFileSync(reportFile(reportDir, page), 'utf8'));
+}
+// Answer the webview's on-demand requests for index pages, single file records, clone groups and directory rollups of a chunked report
+function serveReportChunk(panel, reportDir, message) {
+    try {
+        if (message.type === 'loadPage') {
+            const entries = readIndexPage(reportDir, message.page);
+            panel.webview.postMessage({ type: 'pageLoaded', page: message.page, entries });
+        }
+        else if (message.type === 'loadClones') {
+            const clones = JSON.parse(fs.readFileSync(reportFile(reportDir, message.file), 'utf8'));
+            panel.webview.postMessage({ type: 'clonesLoaded', clones });
+        }
+        else if (message.type === 'loadDirectories') {
+            const directories = JSON.parse(fs.readFileSync(reportFile(reportDir, message.file), 'utf8'));
+            panel.webview.postMessage({ type: 'directoriesLoaded', directories });
+        }
+        else if (message.type === 'loadFile') {
+            const { chunk, offset, length } = message.entry;
+            const buffer = Buffer.alloc(length);
+            const fd = fs.openSync(reportFile(reportDir, chunk), 'r');
+            try {
+                fs.readSync(fd, buffer, 0, length, offset);
+            }
+            finally {
+                fs.closeSync(fd);
+            }
+            panel.webview.postMessage({ type: 'fileLoaded', file: JSON.parse(buffer.toString('utf8')) });
+        }
+    }
+    catch (err) {
+        vscode.window.showErrorMessage(`Could not load report data: ${err instanceof Error ? err.message : err}`);
+    }
+}
 function activate(context) {
     let disposable = vscode.commands.registerCommand('extension.runComplexityChecker', async () => {
         const folderUri = await vscode.window.showOpenDialog({
@@ -58,14 +224,14 @@ function activate(context) {
         }
         const folderPath = folderUri[0].fsPath;
         const pythonScript = path.join(context.extensionPath, 'scripts', 'complexity_checker.py');
-        const outputJson = path.join(folderPath, 'complexity_report.json');
+        const reportDir = path.join(folderPath, 'complexity_report');
         vscode.window.withProgress({
             location: vscode.ProgressLocation.Notification,
             title: "Running Complexity Checker...",
             cancellable: false
         }, async () => {
             return new Promise((resolve, reject) => {
-                (0, child_process_1.execFile)('python', [pythonScript, folderPath], (error, stdout, stderr) => {
+                (0, child_process_1.execFile)('python', [pythonScript, folderPath, '--chunked', '--tier', analysisTier()], (error, stdout, stderr) => {
                     if (error) {
                         vscode.window.showErrorMessage(`Error: ${stderr || error.message}`);
                         reject();
@@ -77,10 +243,17 @@ function activate(context) {
                     try {
                         const htmlPath = path.join(context.extensionPath, 'media', 'webview.html');
                         htmlContent = fs.readFileSync(htmlPath, 'utf8');
-                        jsonData = fs.readFileSync(outputJson, 'utf8');
-                        // Log the parsed JSON to the developer console
-                        const parsedData = JSON.parse(jsonData);
-                        console.log('Complexity Report:', parsedData);
+                        // Only the summary and the first index page are read up front; records load on demand
+                        const chunked = JSON.parse(fs.readFileSync(path.join(reportDir, 'summary.json'), 'utf8'));
+                        const firstPage = chunked.pages.length ? readIndexPage(reportDir, chunked.pages[0]) : [];
+                        jsonData = JSON.stringify({
+                            projectName: chunked.projectName,
+                            summary: chunked.summary,
+                            files: [],
+                            index: firstPage,
+                            chunked: { fileCount: chunked.fileCount, pages: chunked.pages, clones: chunked.clones, directories: chunked.directories, loadedPages: 1 }
+                        });
+                        console.log('Complexity Report Summary:', chunked.summary);
                     }
                     catch (readErr) {
                         let msg = 'Could not read report files.';
@@ -95,6 +268,7 @@ function activate(context) {
                     setTimeout(() => {
                         const panel = vscode.window.createWebviewPanel('complexityView', 'Python Complexity Report', vscode.ViewColumn.One, { enableScripts: true });
                         panel.webview.html = htmlContent;
+                        panel.webview.onDidReceiveMessage(message => serveReportChunk(panel, reportDir, message));
                     }, 100);
                     resolve();
                 });
@@ -102,6 +276,70 @@ function activate(context) {
         });
     });
     context.subscriptions.push(disposable);
+    let watchDisposable = vscode.commands.registerCommand('extension.watchComplexity', async () => {
+        const folderUri = await vscode.window.showOpenDialog({
+            canSelectFolders: true,
+            canSelectFiles: false,
+            canSelectMany: false,
+            openLabel: 'Select Folder to Watch'
+        });
+        if (!folderUri || folderUri.length === 0) {
+            vscode.window.showWarningMessage('No folder selected.');
+            return;
+        }
+        const folderPath = folderUri[0].fsPath;
+        const pythonScript = path.join(context.extensionPath, 'scripts', 'complexity_checker.py');
+        const htmlPath = path.join(context.extensionPath, 'media', 'webview.html');
+        const panel = vscode.window.createWebviewPanel('complexityView', 'Python Complexity Report (Live)', vscode.ViewColumn.One, { enableScripts: true, retainContextWhenHidden: true });
+        // A daemon runs at the tier it was started with, so a changed setting gets a daemon of its own
+        const tier = analysisTier();
+        const daemonKey = `${tier}:${folderPath}`;
+        let daemon = daemons.get(daemonKey);
+        if (!daemon) {
+            const started = new ComplexityDaemon(pythonScript, folderPath, tier, () => {
+                if (daemons.get(daemonKey) === started) {
+                    daemons.delete(daemonKey);
+                }
+            });
+            daemon = started;
+            daemons.set(daemonKey, daemon);
+        }
+        const unsubscribe = daemon.subscribe(delta => panel.webview.postMessage({ type: 'reportChanged', delta }));
+        panel.onDidDispose(unsubscribe);
+        // Clone groups of a live report are fetched when the panel asks, so they reflect the latest changes
+        panel.webview.onDidReceiveMessage(async (message) => {
+            if (message.type === 'loadClones') {
+                try {
+                    panel.webview.postMessage({ type: 'clonesLoaded', clones: await daemon.request('getClones') });
+                }
+                catch (err) {
+                    vscode.window.showErrorMessage(`Could not load clone groups: ${err instanceof Error ? err.message : err}`);
+                }
+            }
+        });
+        await vscode.window.withProgress({
+            location: vscode.ProgressLocation.Notification,
+            title: "Starting Complexity Watcher...",
+            cancellable: false
+        }, async () => {
+            try {
+                const report = await daemon.request('getReport');
+                const htmlContent = fs.readFileSync(htmlPath, 'utf8');
+                panel.webview.html = htmlContent.replace('/*__DATA__*/', `const data = ${JSON.stringify(report)};`);
+            }
+            catch (err) {
+                // A stopped daemon has already told the user why
+                if (!daemon.failed) {
+                    vscode.window.showErrorMessage(`Error: ${err instanceof Error ? err.message : err}`);
+                }
+            }
+        });
+    });
+    context.subscriptions.push(watchDisposable);
+}
+function deactivate() {
+    daemons.forEach(daemon => daemon.dispose());
+    daemons.clear();
 }
 
 
@@ -121,12 +359,18 @@ module.exports = require("child_process");
 /* 3 */
 /***/ ((module) => {
 
-module.exports = require("path");
+module.exports = require("readline");
 
 /***/ }),
 /* 4 */
 /***/ ((module) => {
 
+module.exports = require("path");
+
+/***/ }),
+/* 5 */
+/***/ ((module) => {
+
 module.exports = require("fs");
 
 /***/ })
@@ -0,0 +1,330 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from complexity_checker import CodeAnalyzer, ANALYZER_VERSION
+
+
+def generate_large_module(num_classes, methods_per_class, nesting_depth=3):
+    """Build a synthetic module with nested control flow, nested helpers and module-level functions"""
+    lines = []
+    for c in range(num_classes):
+        lines.append(f"class Generated{c}:")
+        for m in range(methods_per_class):
+            lines.append(f"    def method_{m}(self, a, b, c):")
+            lines.append("        total = 0")
+            indent = "        "
+            for d in range(nesting_depth):
+                keyword = "for" if d % 2 == 0 else "if"
+                if keyword == "for":
+                    lines.append(f"{indent}for i{d} in range(a):")
+                else:
+                    lines.append(f"{indent}if i{d - 1} % {d + 1} == 0:")
+                indent += "    "
+            lines.append(f"{indent}total += b * c")
+            lines.append("        def helper(x):")
+            lines.append("            return x + total")
+            lines.append("        return helper(total)")
+            lines.append("")
+        lines.append("")
+    for f in range(num_classes):
+        lines.append(f"def function_{f}(value):")
+        lines.append("    while value > 0:")
+        lines.append("        value -= 1")
+        lines.append("    return value")
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def generate_method_heavy_module(num_methods, methods_per_class=None):
+    """Build a generated-style module of many small smelly methods (camelCase names, many parameters)"""
+    methods_per_class = methods_per_class or num_methods
+    lines = []
+    for m in range(num_methods):
+        if m % methods_per_class == 0:
+            lines.append(f"class GeneratedModel{m // methods_per_class}:")
+        lines.append(f"    def getField{m}(self, a, b, c, d, e, f):")
+        lines.append(f"        return a + b + c + d + e + f + {m}")
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def generate_smelly_module(index, nesting_depth=5):
+    """Code in the spirit of testing/python_file.py: camelCase names, long parameter lists, deep nesting, unused helpers"""
+    lines = [
+        "import os",
+        "import random",
+        "",
+        f"def processData{index}(a, b, c, d, e, f, g):",
+        "    result = []",
+    ]
+    indent = "    "
+    for d in range(nesting_depth):
+        lines.append(f"{indent}for i{d} in range(a):")
+        indent += "    "
+        lines.append(f"{indent}if i{d} % {d + 2} == 0:")
+        indent += "    "
+    lines.append(f"{indent}result.append(b + c + d + e + f + g)")
+    lines.append("    return result")
+    lines.append("")
+    lines.append(f"def long_report_{index}(values):")
+    lines.append("    total = 0")
+    for n in range(40):
+        lines.append(f"    total += values[{n % 5}] * {n}")
+    lines.append("    return total")
+    lines.append("")
+    lines.append(f"def _unused_helper_{index}():")
+    lines.append("    return random.random() + len(os.sep)")
+    lines.append("")
+    lines.append(f"class legacyModel{index}:")
+    for m in range(12):
+        lines.append(f"    def getValue{m}(self, x):")
+        lines.append(f"        return x * {m}")
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def generate_corpus(output_dir, num_files, num_classes=3, methods_per_class=5, num_functions=3,
+                    nesting_depth=3, smelly_ratio=0.2, large_file_ratio=0.01, large_file_scale=25,
+                    files_per_package=50, seed=0):
+    """
+    Write a synthetic project of packages under `output_dir`. A `smelly_ratio`
+    share of files gets deliberately smelly code appended, and a
+    `large_file_ratio` share is `large_file_scale` times bigger than the rest.
+    Returns the number of lines written.
+    """
+    rng = random.Random(seed)
+    total_lines = 0
+    for index in range(num_files):
+        package_dir = os.path.join(output_dir, f"package_{index // files_per_package}")
+        os.makedirs(package_dir, exist_ok=True)
+
+        classes = num_classes
+        if rng.random() < large_file_ratio:
+            classes *= large_file_scale
+        code = generate_large_module(classes, methods_per_class, nesting_depth)
+        for f in range(num_functions):
+            code += f"def module_{index}_helper_{f}(value):\n    return function_{f % max(classes, 1)}(value)\n\n"
+        if rng.random() < smelly_ratio:
+            code += "\n" + generate_smelly_module(index, nesting_depth + 2)
+
+        with open(os.path.join(package_dir, f"module_{index}.py"), 'w', encoding='utf-8') as f:
+            f.write(code)
+        total_lines += code.count("\n")
+    return total_lines
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of its finished worker processes, in MB"""
+    if resource is None:
+        return None, None
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KB elsewhere
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return round(own, 1), round(children, 1)
+
+
+def run_corpus_benchmark(directory, jobs, stream=False):
+    """Run a full analyze_directory over `directory` and return throughput, memory and phase timings"""
+    analyzer = CodeAnalyzer()
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    analyzer.analyze_directory(directory, jobs=jobs, cache_file=None, stream=stream)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    summary = analyzer.analysis_results["summary"]
+    files = summary["totalFiles"]
+    lines = summary["totalLines"]
+    own_rss, children_rss = peak_rss_mb()
+    return {
+        "files": files,
+        "lines": lines,
+        "jobs": jobs or os.cpu_count() or 1,
+        "stream": stream,
+        "wallTime": round(elapsed, 4),
+        "cpuTime": round(cpu, 4),
+        "filesPerSecond": round(files / elapsed, 2) if elapsed else None,
+        "linesPerSecond": round(lines / elapsed, 2) if elapsed else None,
+        "peakRssMb": own_rss,
+        "peakWorkerRssMb": children_rss,
+        "phases": {phase: round(seconds, 4) for phase, seconds in analyzer.phase_times.items()}
+    }
+
+
+def print_corpus_result(result):
+    print("{:<22} {}".format("Files", result["files"]))
+    print("{:<22} {}".format("Lines", result["lines"]))
+    print("{:<22} {:.3f} s (cpu {:.3f} s)".format("Wall time", result["wallTime"], result["cpuTime"]))
+    print("{:<22} {}".format("Files / s", result["filesPerSecond"]))
+    print("{:<22} {}".format("Lines / s", result["linesPerSecond"]))
+    print("{:<22} {} MB (workers {} MB)".format("Peak RSS", result["peakRssMb"], result["peakWorkerRssMb"]))
+    for phase, seconds in result["phases"].items():
+        print("  {:<20} {:.4f} s".format(phase, seconds))
+
+
+def compare_results(baseline, results, tolerance):
+    """Print how timings moved against a baseline results file; returns the metrics that regressed"""
+    if baseline.get("corpusConfig") != results.get("corpusConfig"):
+        print("Note: corpus configuration differs from the baseline; corpus timings are not comparable")
+    pairs = []
+    if "corpus" in baseline and "corpus" in results:
+        pairs.append(("corpus wall time", baseline["corpus"]["wallTime"], results["corpus"]["wallTime"]))
+        for phase, seconds in results["corpus"]["phases"].items():
+            if phase in baseline["corpus"]["phases"]:
+                pairs.append((f"corpus {phase}", baseline["corpus"]["phases"][phase], seconds))
+    for suite, key in (("scaling", "classes"), ("methods", "methods")):
+        previous = {row[key]: row["time"] for row in baseline.get(suite, [])}
+        for row in results.get(suite, []):
+            if row[key] in previous:
+                pairs.append((f"{suite} {key}={row[key]}", previous[row[key]], row["time"]))
+
+    regressions = []
+    print("{:<28} {:<12} {:<12} {:<8}".format("Metric", "Baseline", "Current", "Ratio"))
+    print("-" * 62)
+    for name, before, after in pairs:
+        ratio = after / before if before else float("inf")
+        print("{:<28} {:<12.4f} {:<12.4f} {:<8.2f}".format(name, before, after, ratio))
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def time_analyze_file(code, repeat):
+    """Return the best wall time of analyze_file over `repeat` runs"""
+    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False, encoding='utf-8') as f:
+        f.write(code)
+        path = f.name
+    try:
+        best = float('inf')
+        for _ in range(repeat):
+            analyzer = CodeAnalyzer()
+            start = time.perf_counter()
+            analyzer.analyze_file(path, os.path.basename(path))
+            best = min(best, time.perf_counter() - start)
+        return best
+    finally:
+        os.remove(path)
+
+
+def run_scaling_benchmark(sizes, methods_per_class, nesting_depth, repeat):
+    """Time analyze_file on growing synthetic files; a flat time-per-line column means linear scaling"""
+    rows = []
+    print("{:<10} {:<10} {:<12} {:<14}".format("Classes", "Lines", "Time (s)", "us / line"))
+    print("-" * 48)
+    for num_classes in sizes:
+        code = generate_large_module(num_classes, methods_per_class, nesting_depth)
+        line_count = code.count("\n")
+        elapsed = time_analyze_file(code, repeat)
+        print("{:<10} {:<10} {:<12.4f} {:<14.2f}".format(
+            num_classes, line_count, elapsed, elapsed / line_count * 1e6
+        ))
+        rows.append({"classes": num_classes, "lines": line_count, "time": round(elapsed, 4)})
+    return rows
+
+
+def run_method_scaling_benchmark(method_counts, repeat):
+    """Time analyze_file on single-class files with many smelly methods; flat time-per-method means linear scaling"""
+    rows = []
+    print("{:<10} {:<12} {:<14}".format("Methods", "Time (s)", "us / method"))
+    print("-" * 36)
+    for num_methods in method_counts:
+        elapsed = time_analyze_file(generate_method_heavy_module(num_methods), repeat)
+        print("{:<10} {:<12.4f} {:<14.2f}".format(num_methods, elapsed, elapsed / num_methods * 1e6))
+        rows.append({"methods": num_methods, "time": round(elapsed, 4)})
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark CodeAnalyzer on synthetic files and corpora")
+    parser.add_argument("--suites", nargs="+", choices=["scaling", "methods", "corpus"],
+                        default=["scaling", "methods", "corpus"], help="Benchmarks to run")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 20, 40, 80],
+                        help="Number of classes in each generated file")
+    parser.add_argument("--methods", type=int, default=20, help="Methods per generated class")
+    parser.add_argument("--depth", type=int, default=3, help="Control-flow nesting depth inside each method")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per size (best time is reported)")
+    parser.add_argument("--method-counts", type=int, nargs="+", default=[625, 1250, 2500, 5000],
+                        help="Method counts for the single-class method scaling benchmark")
+
+    corpus = parser.add_argument_group("corpus benchmark")
+    corpus.add_argument("--files", type=int, default=200, help="Number of files in the generated corpus")
+    corpus.add_argument("--classes", type=int, default=3, help="Classes per generated file")
+    corpus.add_argument("--class-methods", type=int, default=5, help="Methods per class in the corpus")
+    corpus.add_argument("--functions", type=int, default=3, help="Extra module-level functions per file")
+    corpus.add_argument("--smelly-ratio", type=float, default=0.2, help="Share of files with deliberately smelly code")
+    corpus.add_argument("--large-ratio", type=float, default=0.01, help="Share of very large files")
+    corpus.add_argument("--large-scale", type=int, default=25, help="How many times bigger the large files are")
+    corpus.add_argument("--seed", type=int, default=0, help="Seed for the corpus generator")
+    corpus.add_argument("--corpus-dir", default=None,
+                        help="Analyze this directory instead of a generated corpus (or keep the generated one here)")
+    corpus.add_argument("--jobs", "-j", type=int, default=None, help="Worker processes for the corpus run")
+    corpus.add_argument("--stream", action="store_true", help="Benchmark the --stream report writer")
+
+    parser.add_argument("--output", default=None, help="Write all results as JSON to this file")
+    parser.add_argument("--compare", default=None, metavar="BASELINE",
+                        help="Compare against a previous --output file and exit non-zero on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed slowdown against the baseline before it counts as a regression (default 0.15)")
+    args = parser.parse_args()
+
+    results = {
+        "analyzerVersion": ANALYZER_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpuCount": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+
+    # The corpus runs first so the peak RSS reflects analysis rather than the single-file benchmarks
+    if "corpus" in args.suites:
+        generated = args.corpus_dir is None or not os.path.isdir(args.corpus_dir)
+        corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix="complexity_corpus_")
+        try:
+            if generated:
+                lines = generate_corpus(corpus_dir, args.files, args.classes, args.class_methods, args.functions,
+                                        args.depth, args.smelly_ratio, args.large_ratio, args.large_scale,
+                                        seed=args.seed)
+                print(f"Generated {args.files} files ({lines} lines) in {corpus_dir}")
+                results["corpusConfig"] = {
+                    "files": args.files, "classes": args.classes, "classMethods": args.class_methods,
+                    "functions": args.functions, "depth": args.depth, "smellyRatio": args.smelly_ratio,
+                    "largeRatio": args.large_ratio, "largeScale": args.large_scale, "seed": args.seed
+                }
+            results["corpus"] = run_corpus_benchmark(corpus_dir, args.jobs, args.stream)
+            print()
+            print_corpus_result(results["corpus"])
+            print()
+        finally:
+            if args.corpus_dir is None:
+                shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    if "scaling" in args.suites:
+        results["scaling"] = run_scaling_benchmark(args.sizes, args.methods, args.depth, args.repeat)
+        print()
+    if "methods" in args.suites:
+        results["methods"] = run_method_scaling_benchmark(args.method_counts, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBenchmark results saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        regressions = compare_results(baseline, results, args.tolerance)
+        if regressions:
+            sys.exit("Regressions over {:.0%}: {}".format(args.tolerance, ", ".join(regressions)))
@@ -3,13 +3,1746 @@ import ast
 import sys
 import json
 import math
-from radon.complexity import cc_visit
-from radon.metrics import mi_visit
+import time
+import argparse
+import re
+import fnmatch
+import hashlib
+import sqlite3
+import tempfile
+import heapq
+import subprocess
+import threading
+import bisect
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from radon.complexity import cc_visit_ast
+from radon.visitors import Function, ComplexityVisitor
+from radon.metrics import mi_compute, h_visit_ast
 from radon.raw import analyze
-from collections import defaultdict
-from vulture import Vulture
+from collections import defaultdict, Counter, deque
+from pathlib import Path
+from vulture import Vulture, noqa
+
+# Bump whenever a change alters the records produced by analyze_file
+ANALYZER_VERSION = "1.12"
+
+# Cheapest first: quick covers LOC and complexity, standard adds MI and smells,
+# full adds dead code and clone detection, which need the whole project
+ANALYSIS_TIERS = ("quick", "standard", "full")
+
+
+class AnalysisCache:
+    """
+    Persistent per-file cache keyed by content hash. Entries live in SQLite
+    and are loaded on demand, so a large cache is never held in memory.
+    The whole cache is invalidated when the analyzer version or the smell
+    thresholds change. Each analysis tier keeps its own entries, so a quick
+    run does not evict the results of full runs.
+    """
+
+    # deadCode is resolved project-wide on every run from the cached symbols
+    CACHED_FIELDS = ("fileStats", "complexity", "smells", "maintainabilityIndex", "ownership", "symbols", "notebook")
+
+    def __init__(self, cache_path, smell_thresholds, tier="full"):
+        self.cache_path = cache_path
+        self.tier = tier
+        self.config_key = hashlib.sha256(json.dumps(
+            {"version": ANALYZER_VERSION, "thresholds": smell_thresholds}, sort_keys=True
+        ).encode('utf-8')).hexdigest()
+        self.connection = None
+        self.seen = set()
+        self.hits = 0
+        self.misses = 0
+        self.open()
+
+    def open(self):
+        try:
+            self.connection = sqlite3.connect(self.cache_path)
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (hash TEXT PRIMARY KEY, record TEXT, smell_counts TEXT)"
+            )
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'configKey'").fetchone()
+            if row is None or row[0] != self.config_key:
+                self.connection.execute("DELETE FROM entries")
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('configKey', ?)", (self.config_key,)
+                )
+        except sqlite3.Error as e:
+            print(f"Ignoring unusable cache {self.cache_path}: {e}")
+            self.connection = None
+
+    def save(self):
+        # Only entries seen in this run are kept, so deleted files drop out
+        if self.connection is None:
+            return
+        try:
+            self.connection.execute("CREATE TEMP TABLE seen (hash TEXT PRIMARY KEY)")
+            self.connection.executemany("INSERT INTO seen (hash) VALUES (?)", ((h,) for h in self.seen))
+            self.connection.execute("DELETE FROM entries WHERE hash LIKE ? AND hash NOT IN (SELECT hash FROM seen)",
+                                    (self.tier + ":%",))
+            self.connection.commit()
+            self.connection.close()
+        except sqlite3.Error as e:
+            print(f"Error writing cache {self.cache_path}: {e}")
+        self.connection = None
+
+    def hash_source(self, data):
+        """Hash prefetched file contents; unreadable files (an error instead of bytes) have no hash"""
+        if isinstance(data, Exception):
+            return None
+        return f"{self.tier}:{hashlib.sha256(data).hexdigest()}"
+
+    def contains(self, content_hash):
+        """Check for an entry and count the hit or miss"""
+        found = False
+        if content_hash is not None and self.connection is not None:
+            found = self.connection.execute(
+                "SELECT 1 FROM entries WHERE hash = ?", (content_hash,)
+            ).fetchone() is not None
+        if found:
+            self.hits += 1
+            self.seen.add(content_hash)
+        else:
+            self.misses += 1
+        return found
+
+    def lookup(self, content_hash, file_path, relative_path):
+        row = self.connection.execute(
+            "SELECT record, smell_counts FROM entries WHERE hash = ?", (content_hash,)
+        ).fetchone()
+        record = json.loads(row[0])
+        file_data = {"path": relative_path, "fileName": os.path.basename(file_path)}
+        for field in self.CACHED_FIELDS:
+            if field in record:
+                file_data[field] = record[field]
+        # Same key order as a freshly analyzed record
+        file_data["deadCode"] = []
+        for field in ("symbols", "notebook"):
+            if field in file_data:
+                file_data[field] = file_data.pop(field)
+        return file_data, json.loads(row[1])
+
+    def store(self, content_hash, file_data, smell_counts):
+        if content_hash is None or self.connection is None:
+            return
+        record = {field: file_data[field] for field in self.CACHED_FIELDS if field in file_data}
+        self.connection.execute(
+            "INSERT OR REPLACE INTO entries (hash, record, smell_counts) VALUES (?, ?, ?)",
+            (content_hash, json.dumps(record), json.dumps(smell_counts))
+        )
+        self.seen.add(content_hash)
+
+
+def _smell_subject(message):
+    # Smell messages end in a measurement like "(52 lines)"; a smell that only grew is still the same smell
+    return message.split(" (")[0]
+
+
+class HistoryDatabase:
+    """
+    SQLite history of analysis runs. Every run adds a row to `runs` plus its
+    files, functions and smells, so trends and regressions can be queried
+    across many runs without loading any report JSON.
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, project TEXT, directory TEXT, started_at TEXT,
+            analyzer_version TEXT, git_revision TEXT, total_files INTEGER, total_lines INTEGER,
+            maintainability_index REAL, reusability_score REAL, carbon_footprint REAL, tier TEXT DEFAULT 'full')""",
+        """CREATE TABLE IF NOT EXISTS files (
+            run_id INTEGER, path TEXT, loc INTEGER, comments INTEGER, blank INTEGER,
+            maintainability_index REAL, function_count INTEGER, max_complexity INTEGER, smell_count INTEGER,
+            PRIMARY KEY (run_id, path))""",
+        """CREATE TABLE IF NOT EXISTS functions (
+            run_id INTEGER, path TEXT, class_name TEXT, name TEXT, ordinal INTEGER, type TEXT,
+            complexity INTEGER)""",
+        """CREATE TABLE IF NOT EXISTS smells (
+            run_id INTEGER, path TEXT, type TEXT, subject TEXT, message TEXT, line INTEGER)""",
+        "CREATE INDEX IF NOT EXISTS files_by_path ON files (path, run_id)",
+        "CREATE INDEX IF NOT EXISTS files_by_mi ON files (run_id, maintainability_index)",
+        "CREATE INDEX IF NOT EXISTS functions_by_complexity ON functions (run_id, complexity DESC)",
+        "CREATE INDEX IF NOT EXISTS functions_by_name ON functions (path, class_name, name, run_id)",
+        "CREATE INDEX IF NOT EXISTS functions_by_run_path ON functions (run_id, path, name, ordinal)",
+        "CREATE INDEX IF NOT EXISTS smells_by_run ON smells (run_id, path, type, subject)",
+        "CREATE INDEX IF NOT EXISTS smells_by_type ON smells (type, run_id)",
+    )
+
+    def __init__(self, database_path):
+        self.database_path = database_path
+        self.connection = sqlite3.connect(database_path)
+        for statement in self.SCHEMA:
+            self.connection.execute(statement)
+        # Databases from before analysis tiers only hold full runs
+        if "tier" not in {row[1] for row in self.connection.execute("PRAGMA table_info(runs)")}:
+            self.connection.execute("ALTER TABLE runs ADD COLUMN tier TEXT DEFAULT 'full'")
+        self.run_id = None
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def start_run(self, project, directory_path, tier="full"):
+        revision = None
+        try:
+            revision = subprocess.run(["git", "-C", directory_path, "rev-parse", "HEAD"], capture_output=True,
+                                      text=True, check=True).stdout.strip() or None
+        except (OSError, subprocess.CalledProcessError):
+            pass
+        cursor = self.connection.execute(
+            "INSERT INTO runs (project, directory, started_at, analyzer_version, git_revision, tier) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (project, os.path.abspath(directory_path), time.strftime("%Y-%m-%dT%H:%M:%S"), ANALYZER_VERSION,
+             revision, tier)
+        )
+        self.run_id = cursor.lastrowid
+        return self.run_id
+
+    def add_file(self, file_data):
+        """Record one finalized file with its functions, smells and dead code"""
+        path = file_data["path"]
+        stats = file_data["fileStats"]
+        smells = [(self.run_id, path, smell["type"], _smell_subject(smell["message"]), smell["message"],
+                   smell.get("line")) for smell in file_data["smells"]]
+        smells.extend((self.run_id, path, "Dead Code", entry, entry, None) for entry in file_data["deadCode"])
+        complexity = file_data["complexity"]
+        self.connection.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.run_id, path, stats.get("loc", 0), stats.get("comments", 0), stats.get("blank", 0),
+             file_data.get("maintainabilityIndex"), len(complexity),
+             max((comp["value"] for comp in complexity), default=0), len(smells))
+        )
+        # Same-named functions in a file (overloads, test helpers) are told apart by their order
+        ordinals = defaultdict(int)
+        functions = []
+        for comp in complexity:
+            key = (comp["class"], comp["name"])
+            functions.append((self.run_id, path, comp["class"], comp["name"], ordinals[key], comp["type"], comp["value"]))
+            ordinals[key] += 1
+        self.connection.executemany("INSERT INTO functions VALUES (?, ?, ?, ?, ?, ?, ?)", functions)
+        self.connection.executemany("INSERT INTO smells VALUES (?, ?, ?, ?, ?, ?)", smells)
+
+    def finish_run(self, summary):
+        self.connection.execute(
+            """UPDATE runs SET total_files = ?, total_lines = ?, maintainability_index = ?,
+               reusability_score = ?, carbon_footprint = ? WHERE id = ?""",
+            (summary["totalFiles"], summary["totalLines"], summary["maintainabilityIndex"],
+             summary["reusabilityScore"], summary["carbonFootprint"], self.run_id)
+        )
+        self.connection.commit()
+
+    # Queries
+
+    def _rows(self, query, parameters=()):
+        cursor = self.connection.execute(query, parameters)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def runs(self, limit=20):
+        return self._rows(
+            """SELECT id, project, started_at, git_revision, tier, total_files, total_lines, maintainability_index,
+               reusability_score, carbon_footprint FROM runs ORDER BY id DESC LIMIT ?""", (limit,)
+        )
+
+    def resolve_run(self, run_id=None, offset=0):
+        """A run id as given, or the latest run (offset=1 for the one before it)"""
+        if run_id is not None:
+            return run_id
+        row = self.connection.execute("SELECT id FROM runs ORDER BY id DESC LIMIT 1 OFFSET ?", (offset,)).fetchone()
+        return row[0] if row else None
+
+    def previous_run(self, run_id):
+        """The latest run before `run_id` made at the same tier, so a quick run is not compared with a full one"""
+        row = self.connection.execute(
+            "SELECT max(id) FROM runs WHERE id < ? AND tier IS (SELECT tier FROM runs WHERE id = ?)", (run_id, run_id)
+        ).fetchone()
+        return row[0]
+
+    def worst_functions(self, run_id=None, limit=10):
+        return self._rows(
+            """SELECT path, class_name, name, type, complexity FROM functions
+               WHERE run_id = ? ORDER BY complexity DESC, path, name LIMIT ?""",
+            (self.resolve_run(run_id), limit)
+        )
+
+    def file_trend(self, path, limit=50):
+        return self._rows(
+            """SELECT r.id AS run_id, r.started_at, r.git_revision, f.loc, f.maintainability_index,
+               f.function_count, f.max_complexity, f.smell_count
+               FROM files f JOIN runs r ON r.id = f.run_id WHERE f.path = ? ORDER BY r.id DESC LIMIT ?""",
+            (path, limit)
+        )
+
+    def new_smells(self, run_id=None, baseline_id=None):
+        """Smells in a run with no counterpart of the same type and subject in the same file of the baseline"""
+        run_id = self.resolve_run(run_id)
+        if baseline_id is None:
+            baseline_id = self.previous_run(run_id)
+        return self._rows(
+            """SELECT s.path, s.type, s.message, s.line FROM smells s
+               WHERE s.run_id = ? AND NOT EXISTS (
+                   SELECT 1 FROM smells p WHERE p.run_id = ? AND p.path = s.path
+                   AND p.type = s.type AND p.subject = s.subject)
+               ORDER BY s.path, s.line""",
+            (run_id, baseline_id)
+        )
+
+    def complexity_changes(self, run_id=None, baseline_id=None, limit=20):
+        """Functions whose complexity grew the most between the baseline and the run"""
+        run_id = self.resolve_run(run_id)
+        if baseline_id is None:
+            baseline_id = self.previous_run(run_id)
+        return self._rows(
+            """SELECT c.path, c.class_name, c.name, b.complexity AS before, c.complexity AS after,
+               c.complexity - b.complexity AS delta FROM functions c
+               JOIN functions b ON b.run_id = ? AND b.path = c.path AND b.name = c.name
+                   AND b.ordinal = c.ordinal AND b.class_name IS c.class_name
+               WHERE c.run_id = ? AND c.complexity > b.complexity
+               ORDER BY delta DESC, c.path LIMIT ?""",
+            (baseline_id, run_id, limit)
+        )
+
+
+class ProjectTotals:
+    """Running totals behind the project summary, so it can be built without keeping every record"""
+
+    def __init__(self):
+        self.total_files = 0
+        self.total_lines = 0
+        self.weighted_mi = 0
+        self.mi_weight = 0
+        self.mi_files = 0
+        self.total_classes = 0
+        self.total_functions = 0
+        self.class_methods = 0
+
+    def add(self, file_data, sign=1):
+        self.total_files += sign
+        self.total_lines += sign * file_data["fileStats"].get("loc", 0)
+
+        # Maintainability index is weighted by file size
+        if "maintainabilityIndex" in file_data:
+            weight = file_data["fileStats"].get("loc", 1)
+            self.weighted_mi += sign * file_data["maintainabilityIndex"] * weight
+            self.mi_weight += sign * weight
+            self.mi_files += sign
+
+        for class_name, methods in file_data["ownership"].items():
+            if class_name != "<global>":
+                self.total_classes += sign
+                self.class_methods += sign * len(methods)
+            self.total_functions += sign * len(methods)
+
+    def remove(self, file_data):
+        """Take back what add() counted for the record, e.g. before adding its new version"""
+        self.add(file_data, -1)
+
+    @property
+    def average_mi(self):
+        if self.mi_files and self.mi_weight > 0:
+            return self.weighted_mi / self.mi_weight
+        return 0
+
+
+class DirectoryRollups:
+    """
+    Totals for every directory of the analyzed tree, each covering its whole
+    subtree: files, LOC, size-weighted MI, classes, functions and smell
+    counts, from which MI and the carbon footprint are derived on output.
+    A file adds its contribution to its ancestor directories only. Once a
+    file's contribution is recorded with `set`, replacing or removing it
+    only touches those ancestors as well.
+    """
+
+    def __init__(self):
+        self.nodes = defaultdict(Counter)  # directory ("" for the root) -> subtree totals
+        self.contributions = {}            # path -> contribution recorded by set()
+
+    @staticmethod
+    def ancestors(path):
+        """The root and every directory above `path`, outermost first"""
+        parts = path.replace('\\', '/').split('/')[:-1]
+        return [""] + ['/'.join(parts[:depth]) for depth in range(1, len(parts) + 1)]
+
+    @staticmethod
+    def contribution(file_data, smell_counts):
+        """What a file adds to each of its ancestors; dead code comes from the resolved record"""
+        loc = file_data["fileStats"].get("loc", 0)
+        contribution = Counter(files=1, lines=loc)
+        if file_data.get("maintainabilityIndex") is not None:
+            # Hundredths of an MI point, so repeated updates add and subtract exactly
+            weight = file_data["fileStats"].get("loc", 1)
+            contribution["miWeighted"] = round(file_data["maintainabilityIndex"] * 100) * weight
+            contribution["miWeight"] = weight
+        for class_name, methods in file_data["ownership"].items():
+            if class_name != "<global>":
+                contribution["classes"] += 1
+            contribution["functions"] += len(methods)
+        for smell, count in smell_counts.items():
+            if smell != 'dead_code':
+                contribution["smell:" + smell] += count
+        contribution["smell:dead_code"] += len(file_data["deadCode"])
+        return +contribution
+
+    def add(self, path, contribution):
+        for directory in self.ancestors(path):
+            self.nodes[directory].update(contribution)
+
+    def subtract(self, path, contribution):
+        for directory in self.ancestors(path):
+            node = self.nodes[directory]
+            node.subtract(contribution)
+            if node["files"] <= 0:
+                del self.nodes[directory]
+
+    def set(self, path, contribution):
+        """Replace the recorded contribution of `path`"""
+        self.remove(path)
+        self.add(path, contribution)
+        self.contributions[path] = contribution
+
+    def remove(self, path):
+        contribution = self.contributions.pop(path, None)
+        if contribution is not None:
+            self.subtract(path, contribution)
+
+    def rollup(self, directory, analyzer):
+        node = self.nodes[directory]
+        smell_counts = Counter({key[len("smell:"):]: count for key, count in node.items()
+                                if key.startswith("smell:") and count})
+        return {
+            "files": node["files"],
+            "lines": node["lines"],
+            "classes": node["classes"],
+            "functions": node["functions"],
+            "maintainabilityIndex": round(node["miWeighted"] / node["miWeight"] / 100, 2) if node["miWeight"] else None,
+            "carbonFootprint": round(analyzer.estimate_carbon_footprint(
+                node["lines"], node["classes"], node["functions"], smell_counts), 2),
+            "smellCount": sum(smell_counts.values()),
+            "smells": dict(sorted(smell_counts.items()))
+        }
+
+    def summary(self, analyzer):
+        """Every directory's rollup keyed by its '/'-separated path, parents before their subdirectories"""
+        directories = sorted(self.nodes, key=lambda directory: directory.split('/') if directory else [])
+        return {directory: self.rollup(directory, analyzer) for directory in directories}
+
+    def changed(self, paths, analyzer):
+        """Rollups of the ancestors of `paths` only, None for directories left without files"""
+        directories = sorted({directory for path in paths for directory in self.ancestors(path)},
+                             key=lambda directory: directory.split('/') if directory else [])
+        return {directory: self.rollup(directory, analyzer) if directory in self.nodes else None
+                for directory in directories}
+
+
+class PhaseTimer:
+    """Accumulates wall and CPU seconds per named phase of one file's analysis"""
+
+    def __init__(self, phases=None):
+        self.phases = phases if phases is not None else {}
+
+    @contextmanager
+    def phase(self, name):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            entry = self.phases.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+            entry["wall"] = round(entry["wall"] + time.perf_counter() - wall_start, 6)
+            entry["cpu"] = round(entry["cpu"] + time.process_time() - cpu_start, 6)
+
+
+class _NullTimer:
+    """Stand-in for PhaseTimer when timings are off, so the analysis code reads the same either way"""
+
+    def phase(self, name):
+        return nullcontext()
+
+
+NULL_TIMER = _NullTimer()
+
+
+class TimingStats:
+    """Aggregates per-file phase timings into totals, percentiles and the slowest files"""
+
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self, slowest_count=10):
+        self.slowest_count = slowest_count
+        self.files_timed = 0
+        self.totals = defaultdict(lambda: {"wall": 0.0, "cpu": 0.0})
+        self.samples = defaultdict(list)
+        self.slowest = []  # min-heap of (wall, path, cpu, slowest phase)
+
+    def add(self, file_data):
+        timings = file_data.get("timings")
+        if not timings:
+            return
+        self.files_timed += 1
+        wall = sum(entry["wall"] for entry in timings.values())
+        cpu = sum(entry["cpu"] for entry in timings.values())
+        for phase, entry in timings.items():
+            self.totals[phase]["wall"] += entry["wall"]
+            self.totals[phase]["cpu"] += entry["cpu"]
+            self.samples[phase].append(entry["wall"])
+        self.samples["total"].append(wall)
+
+        slowest_phase = max(timings, key=lambda phase: timings[phase]["wall"])
+        item = (wall, file_data["path"], cpu, slowest_phase)
+        if len(self.slowest) < self.slowest_count:
+            heapq.heappush(self.slowest, item)
+        elif item > self.slowest[0]:
+            heapq.heapreplace(self.slowest, item)
+
+    def _percentiles(self, values):
+        values = sorted(values)
+        result = {}
+        for percentile in self.PERCENTILES:
+            rank = max(1, math.ceil(percentile / 100 * len(values)))
+            result[f"p{percentile}"] = round(values[rank - 1], 6)
+        result["max"] = round(values[-1], 6)
+        return result
+
+    def summary(self, run_phases):
+        return {
+            "filesTimed": self.files_timed,
+            "run": {phase: round(seconds, 4) for phase, seconds in run_phases.items()},
+            "totals": {phase: {"wall": round(entry["wall"], 4), "cpu": round(entry["cpu"], 4)}
+                       for phase, entry in self.totals.items()},
+            "percentiles": {phase: self._percentiles(values) for phase, values in self.samples.items()},
+            "slowestFiles": [
+                {"path": path, "wall": round(wall, 4), "cpu": round(cpu, 4), "slowestPhase": phase}
+                for wall, path, cpu, phase in sorted(self.slowest, reverse=True)
+            ]
+        }
+
+
+class StreamingReportWriter:
+    """
+    Writes complexity_report.json incrementally, one file record at a time,
+    with the summary, clone groups and directory rollups appended once the
+    run is complete.
+    With indent=2 the output is byte-for-byte what json.dump produces for
+    the whole report; without it each record is one compact line.
+    """
+
+    def __init__(self, output_path, project_name, indent=None):
+        self.output_path = output_path
+        self.indent = indent
+        self.file = open(output_path, 'w', encoding='utf-8')
+        if indent:
+            self.file.write('{\n  "projectName": %s,\n  "files": [' % json.dumps(project_name))
+        else:
+            self.file.write('{"projectName": %s, "files": [\n' % json.dumps(project_name))
+        self.count = 0
+
+    def write_record(self, file_data):
+        if self.indent:
+            record = json.dumps(file_data, indent=self.indent).replace('\n', '\n    ')
+            self.file.write((',\n    ' if self.count else '\n    ') + record)
+        else:
+            if self.count:
+                self.file.write(',\n')
+            self.file.write(json.dumps(file_data))
+        self.count += 1
+
+    def close(self, summary, clones=(), directories=None):
+        if self.indent:
+            closing = '\n  ]' if self.count else ']'
+            summary_json, clones_json, directories_json = (
+                json.dumps(value, indent=self.indent).replace('\n', '\n  ')
+                for value in (summary, list(clones), directories or {}))
+            self.file.write('%s,\n  "summary": %s,\n  "clones": %s,\n  "directories": %s\n}'
+                            % (closing, summary_json, clones_json, directories_json))
+        else:
+            self.file.write('\n], "summary": %s, "clones": %s, "directories": %s}\n'
+                            % (json.dumps(summary, indent=2), json.dumps(list(clones)), json.dumps(directories or {})))
+        self.file.close()
+
+
+class ChunkedReportWriter:
+    """
+    Writes the report as a directory the viewer can open without reading
+    every record: summary.json (project summary and paging info), index
+    pages with each file's headline numbers and the byte range of its
+    record, and data chunks holding the records one compact line each.
+    Index page k describes exactly the records in data chunk k. Clone
+    groups and directory rollups grow with the tree, so they get files of
+    their own and summary.json keeps a constant size.
+    """
+
+    CLONES_FILE = "clones.json"
+    DIRECTORIES_FILE = "directories.json"
+
+    PAGE_SIZE = 1000
+
+    def __init__(self, output_dir, project_name, page_size=PAGE_SIZE):
+        self.output_dir = output_dir
+        self.project_name = project_name
+        self.page_size = page_size
+        os.makedirs(output_dir, exist_ok=True)
+        # Pages from an earlier, larger run would otherwise linger
+        for name in os.listdir(output_dir):
+            if fnmatch.fnmatch(name, "index-*.json") or fnmatch.fnmatch(name, "data-*.jsonl"):
+                os.remove(os.path.join(output_dir, name))
+        self.pages = []
+        self.chunks = []
+        self.entries = []
+        self.data = None
+        self.offset = 0
+        self.count = 0
+
+    def write_record(self, file_data):
+        if self.data is None:
+            chunk_name = f"data-{len(self.chunks):04d}.jsonl"
+            self.chunks.append(chunk_name)
+            self.data = open(os.path.join(self.output_dir, chunk_name), 'wb')
+            self.offset = 0
+        line = json.dumps(file_data).encode('utf-8')
+        self.data.write(line + b'\n')
+        self.entries.append({
+            "path": file_data["path"],
+            "fileName": file_data["fileName"],
+            "maintainabilityIndex": file_data.get("maintainabilityIndex"),
+            "loc": file_data["fileStats"].get("loc", 0),
+            "smellCount": len(file_data["smells"]),
+            "deadCodeCount": len(file_data["deadCode"]),
+            "maxComplexity": max((comp["value"] for comp in file_data["complexity"]), default=0),
+            "chunk": self.chunks[-1],
+            "offset": self.offset,
+            "length": len(line)
+        })
+        self.offset += len(line) + 1
+        self.count += 1
+        if len(self.entries) == self.page_size:
+            self._flush_page()
+
+    def _flush_page(self):
+        page_name = f"index-{len(self.pages):04d}.json"
+        with open(os.path.join(self.output_dir, page_name), 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        self.pages.append(page_name)
+        self.entries = []
+        self.data.close()
+        self.data = None
+
+    def close(self, summary, clones=(), directories=None):
+        if self.entries:
+            self._flush_page()
+        with open(os.path.join(self.output_dir, self.CLONES_FILE), 'w', encoding='utf-8') as f:
+            json.dump(list(clones), f)
+        with open(os.path.join(self.output_dir, self.DIRECTORIES_FILE), 'w', encoding='utf-8') as f:
+            json.dump(directories or {}, f)
+        with open(os.path.join(self.output_dir, "summary.json"), 'w', encoding='utf-8') as f:
+            json.dump({
+                "projectName": self.project_name,
+                "summary": summary,
+                "fileCount": self.count,
+                "pageSize": self.page_size,
+                "pages": self.pages,
+                "chunks": self.chunks,
+                "clones": self.CLONES_FILE,
+                "directories": self.DIRECTORIES_FILE
+            }, f, indent=2)
+
+
+class RecordStore:
+    """
+    Finished file records held as compact JSON strings instead of nested
+    dicts. Once the held records exceed `max_memory` bytes they are spilled
+    to a temporary file (max_memory=0 spills every record). Iterating yields
+    the records as dicts, in the order they were added.
+    """
+
+    def __init__(self, max_memory=None):
+        self.max_memory = max_memory
+        self.memory = []
+        self.memory_bytes = 0
+        self.spill = None
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def append(self, file_data):
+        line = json.dumps(file_data, separators=(',', ':'))
+        self.memory.append(line)
+        self.memory_bytes += len(line)
+        self.count += 1
+        if self.max_memory is not None and self.memory_bytes > self.max_memory:
+            self._spill()
+
+    def _spill(self):
+        if self.spill is None:
+            self.spill = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self.spill.writelines(line + '\n' for line in self.memory)
+        self.memory = []
+        self.memory_bytes = 0
+
+    def __iter__(self):
+        if self.spill is not None:
+            self.spill.seek(0)
+            for line in self.spill:
+                yield json.loads(line)
+        for line in self.memory:
+            yield json.loads(line)
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+        self.memory = []
+
+
+DEFAULT_READS_IN_FLIGHT = 16
+
+
+class FilePrefetcher:
+    """
+    Reads file contents ahead of the analysis on a pool of reader threads.
+    At most `reads_in_flight` files are being read or waiting to be consumed,
+    so on a network filesystem the read latency overlaps with parsing while
+    memory stays bounded. Contents come back in input order.
+    """
+
+    def __init__(self, reads_in_flight=DEFAULT_READS_IN_FLIGHT):
+        self.reads_in_flight = max(1, reads_in_flight)
+
+    @staticmethod
+    def _read(file_path):
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            with open(file_path, 'rb') as file:
+                data = file.read()
+        except OSError as e:
+            data = e
+        return data, {"wall": round(time.perf_counter() - wall_start, 6),
+                      "cpu": round(time.thread_time() - cpu_start, 6)}
+
+    def read(self, file_list):
+        """
+        Yield (file_path, relative_path, data, read_time) for each pair in
+        `file_list`, which may be a lazy iterable. `data` is the raw bytes or
+        the OSError raised while reading, `read_time` the read's wall and CPU
+        seconds on its reader thread.
+        """
+        with ThreadPoolExecutor(max_workers=self.reads_in_flight, thread_name_prefix="prefetch") as pool:
+            window = deque()
+            for file_path, relative_path in file_list:
+                window.append((file_path, relative_path, pool.submit(self._read, file_path)))
+                if len(window) >= self.reads_in_flight:
+                    file_path, relative_path, future = window.popleft()
+                    yield (file_path, relative_path) + future.result()
+            while window:
+                file_path, relative_path, future = window.popleft()
+                yield (file_path, relative_path) + future.result()
+
+
+def _decode_source(data):
+    """Decode file bytes exactly as open(path, 'r', encoding='utf-8').read() would, newlines included"""
+    return data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+
+# Comments and string literals; strings are matched whole so a '#' inside one is not taken for a comment
+_COMMENT_OR_STRING = re.compile(
+    r'''#[^\n]*|"""(?:\\.|[^\\])*?"""|\'\'\'(?:\\.|[^\\])*?\'\'\'|"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*\'''',
+    re.DOTALL
+)
+
+
+def _line_stats(code):
+    """
+    The loc, blank and comment counts of radon's raw metrics from a regex
+    scan instead of the tokenizer, for the quick tier. Counts match radon on
+    valid code; the tokenizer-only fields (sloc, lloc, multi) are left out.
+    """
+    lines = code.splitlines()
+    loc = len(lines)
+    comments = sum(1 for match in _COMMENT_OR_STRING.finditer(code) if match.group().startswith('#'))
+    return {
+        "loc": loc,
+        "comments": comments,
+        "blank": sum(1 for line in lines if not line.strip()),
+        "commentRatio": comments / loc if loc > 0 else 0
+    }
+
+
+SOURCE_SUFFIXES = ('.py', '.ipynb')
+# Cell magics whose body is still Python; cells under any other %% magic (%%bash, %%html, ...) are skipped
+PYTHON_CELL_MAGICS = {"time", "timeit", "capture", "prun", "debug"}
+
+
+def _notebook_source(text):
+    """
+    Concatenate a notebook's code cells into one module in memory. IPython
+    magics and shell escapes become comments, and cells that still are not
+    Python are left out. Returns the code, [cell index, first line, line
+    count] for every kept cell (indexes count all cells, as in the
+    profiler's output) and the indexes of the skipped code cells.
+    """
+    notebook = json.loads(text)
+    lines = []
+    cells = []
+    skipped = []
+    for index, cell in enumerate(notebook.get("cells", [])):
+        if cell.get("cell_type") != "code":
+            continue
+        source = cell.get("source", "")
+        cell_lines = ("".join(source) if isinstance(source, list) else source).splitlines()
+        if not cell_lines:
+            continue
+        magic = cell_lines[0].strip()
+        if magic.startswith("%%") and (magic[2:].split() or [""])[0] not in PYTHON_CELL_MAGICS:
+            skipped.append(index)
+            continue
+        cell_lines = [
+            line[:len(line) - len(line.lstrip())] + "# " + line.lstrip()
+            if line.lstrip().startswith(("%", "!")) else line
+            for line in cell_lines
+        ]
+        try:
+            ast.parse("\n".join(cell_lines))
+        except SyntaxError:
+            skipped.append(index)
+            continue
+        cells.append([index, len(lines) + 1, len(cell_lines)])
+        lines.extend(cell_lines)
+    return "".join(line + "\n" for line in lines), cells, skipped
+
+
+def _gitignore_regex(pattern):
+    """Translate one .gitignore glob into a regex over '/'-separated paths relative to its directory"""
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    parts = [] if anchored else ['(?:.*/)?']
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+            continue
+        if char == '*':
+            parts.append('[^/]*')
+        elif char == '?':
+            parts.append('[^/]')
+        elif char == '\\' and i + 1 < len(pattern):
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        elif char == '[':
+            end = pattern.find(']', i + 2)
+            if end == -1:
+                parts.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end].replace('\\', '\\\\')
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                parts.append(f'[{body}]')
+                i = end
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return re.compile(''.join(parts))
+
+
+class FileDiscovery:
+    """
+    scandir-based replacement for os.walk that prunes whole directories as
+    early as possible: vendored and virtualenv trees, .gitignore matches
+    and exclude globs are never descended into. Files can further be
+    filtered by include globs, a size limit and generated-code markers.
+    Paths come out in the same order os.walk with sorted names produces.
+    """
+
+    PRUNED_DIRECTORIES = {'node_modules', '.venv', 'venv', 'build', 'site-packages', '.git', '.hg',
+                          '__pycache__', '.tox', '.nox', '.eggs', '.mypy_cache', '.pytest_cache'}
+    GENERATED_SUFFIXES = ('_pb2.py', '_pb2_grpc.py')
+    NOTEBOOK_COPY_SUFFIX = '_wrapped.py'  # written next to a notebook by the notebook profiler
+    # Conventional generator headers only: "@generated", "Code generated by X. DO NOT EDIT." or a bare "DO NOT EDIT"
+    GENERATED_HEADER = re.compile(rb'(?:^|\s)@generated\b|^Code generated .* DO NOT EDIT\W*$|^DO NOT EDIT\W*$')
+    HEADER_BYTES = 1024
+
+    def __init__(self, directory_path, include=None, exclude=None, max_file_size=1_000_000,
+                 use_gitignore=True, skip_generated=True):
+        self.directory_path = directory_path
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.max_file_size = max_file_size
+        self.use_gitignore = use_gitignore
+        self.skip_generated = skip_generated
+        self.skipped = defaultdict(int)
+        self.generated = []  # relative paths skipped as generated
+        self.directory_rules = {}  # relative directory -> ignore rules in force inside it, for accepts()
+
+        # Ignore rules are matched on paths relative to the enclosing repository's root
+        root = os.path.abspath(directory_path)
+        self.top = root
+        while not os.path.exists(os.path.join(self.top, '.git')):
+            parent = os.path.dirname(self.top)
+            if parent == self.top:
+                self.top = root
+                break
+            self.top = parent
+        self.prefix = os.path.relpath(root, self.top).replace(os.sep, '/')
+        self.prefix = '' if self.prefix == '.' else self.prefix + '/'
+
+        self.base_rules = []
+        if self.use_gitignore:
+            self.base_rules += self._load_rules(os.path.join(self.top, '.git', 'info', 'exclude'), '')
+            if self.prefix:
+                # .gitignore files above the analyzed directory still apply to it
+                ancestor = ''
+                for part in self.prefix.rstrip('/').split('/'):
+                    self.base_rules += self._load_rules(os.path.join(self.top, ancestor, '.gitignore'), ancestor)
+                    ancestor = f'{ancestor}{part}/'
+
+    def _load_rules(self, ignore_file, base):
+        """Parse a .gitignore into (regex, negated, directory_only, base) rules"""
+        rules = []
+        try:
+            with open(ignore_file, 'r', encoding='utf-8', errors='replace') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return rules
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith('#'):
+                continue
+            negated = line.startswith('!')
+            if negated:
+                line = line[1:]
+            directory_only = line.endswith('/')
+            line = line.rstrip('/')
+            if line:
+                rules.append((_gitignore_regex(line), negated, directory_only, base))
+        return rules
+
+    def _ignored(self, rules, relative_path, is_dir):
+        top_path = self.prefix + relative_path
+        ignored = False
+        for regex, negated, directory_only, base in rules:
+            if directory_only and not is_dir:
+                continue
+            if base and not top_path.startswith(base):
+                continue
+            if regex.fullmatch(top_path[len(base):]):
+                ignored = not negated
+        return ignored
+
+    def _excluded(self, relative_path, name):
+        return any(fnmatch.fnmatchcase(relative_path, glob) or fnmatch.fnmatchcase(name, glob)
+                   for glob in self.exclude)
+
+    def _included(self, relative_path, name):
+        return not self.include or any(fnmatch.fnmatchcase(relative_path, glob) or fnmatch.fnmatchcase(name, glob)
+                                       for glob in self.include)
+
+    def _is_generated(self, name, path):
+        """Generated-file name suffixes, or a generator marker in the comment block that opens the file"""
+        if name.endswith(self.GENERATED_SUFFIXES):
+            return True
+        if (name.endswith(self.NOTEBOOK_COPY_SUFFIX)
+                and os.path.exists(path[:-len(self.NOTEBOOK_COPY_SUFFIX)] + '.ipynb')):
+            return True  # the notebook itself is analyzed
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(self.HEADER_BYTES)
+        except OSError:
+            return False
+        for line in header.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith(b'#'):
+                return False  # the leading comment block ends at the first line of code
+            if self.GENERATED_HEADER.search(line.lstrip(b'#').strip()):
+                return True
+        return False
+
+    def _prune_directory(self, name, relative_path, rules):
+        if name in self.PRUNED_DIRECTORIES:
+            return 'vendored'
+        if self._excluded(relative_path, name):
+            return 'excluded'
+        if self._ignored(rules, relative_path, True):
+            return 'gitignore'
+        return None
+
+    def _skip_file(self, entry, relative_path, rules):
+        if not self._included(relative_path, entry.name) or self._excluded(relative_path, entry.name):
+            return 'excluded'
+        if self._ignored(rules, relative_path, False):
+            return 'gitignore'
+        return self._skip_contents(entry.name, entry.path, entry.stat().st_size)
+
+    def _skip_contents(self, name, path, size):
+        # Notebooks are mostly stored outputs, so their size says little about their code
+        if self.max_file_size and not name.endswith('.ipynb') and size > self.max_file_size:
+            return 'tooLarge'
+        if self.skip_generated and self._is_generated(name, path):
+            return 'generated'
+        return None
+
+    def _rules_for(self, relative_dir):
+        """Ignore rules in force inside `relative_dir` ('' or ending in '/'), each .gitignore read once"""
+        rules = self.directory_rules.get(relative_dir)
+        if rules is None:
+            if relative_dir:
+                rules = self._rules_for(relative_dir[:relative_dir.rstrip('/').rfind('/') + 1])
+            else:
+                rules = self.base_rules
+            if self.use_gitignore:
+                rules = rules + self._load_rules(os.path.join(self.directory_path, relative_dir, '.gitignore'),
+                                                 self.prefix + relative_dir)
+            self.directory_rules[relative_dir] = rules
+        return rules
+
+    def accepts(self, relative_path):
+        """Path-only check for files that did not come from the walk, e.g. a git diff"""
+        parts = relative_path.replace(os.sep, '/').split('/')
+        relative_dir = ''
+        for name in parts[:-1]:
+            rules = self._rules_for(relative_dir)
+            relative_dir += name + '/'
+            if (self._prune_directory(name, relative_dir.rstrip('/'), rules)
+                    or os.path.exists(os.path.join(self.directory_path, relative_dir, 'pyvenv.cfg'))):
+                return False
+        rules = self._rules_for(relative_dir)
+        path = relative_dir + parts[-1]
+        return (self._included(path, parts[-1]) and not self._excluded(path, parts[-1])
+                and not self._ignored(rules, path, False))
+
+    def accepts_file(self, relative_path):
+        """accepts() plus the size and generated-code checks, for a file on disk that the walk would list"""
+        if not self.accepts(relative_path):
+            return False
+        path = os.path.join(self.directory_path, relative_path)
+        try:
+            size = os.stat(path).st_size
+        except OSError:
+            return False
+        return self._skip_contents(os.path.basename(path), path, size) is None
+
+    def walk(self):
+        """Yield (file_path, relative_path) for every .py and .ipynb file that survives the filters"""
+        stack = [(self.directory_path, '', self.base_rules)]
+        while stack:
+            dir_path, relative_dir, rules = stack.pop()
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError as e:
+                print(f"Error reading directory {dir_path}: {e}")
+                continue
+
+            names = {entry.name for entry in entries}
+            if relative_dir and 'pyvenv.cfg' in names:
+                self.skipped['vendored'] += 1
+                continue
+            if self.use_gitignore and '.gitignore' in names:
+                rules = rules + self._load_rules(os.path.join(dir_path, '.gitignore'), self.prefix + relative_dir)
+
+            subdirectories = []
+            for entry in entries:
+                relative_path = relative_dir + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    reason = self._prune_directory(entry.name, relative_path, rules)
+                    if reason:
+                        self.skipped[reason] += 1
+                    else:
+                        subdirectories.append((entry.path, relative_path + '/', rules))
+                elif entry.name.endswith(SOURCE_SUFFIXES) and entry.is_file():
+                    reason = self._skip_file(entry, relative_path, rules)
+                    if reason:
+                        self.skipped[reason] += 1
+                        if reason == 'generated':
+                            self.generated.append(relative_path)
+                    else:
+                        yield entry.path, relative_path.replace('/', os.sep)
+            stack.extend(reversed(subdirectories))
+
+
+class ParsedSource:
+    """
+    One file's source, tokenized and parsed once. The raw token metrics,
+    the AST and radon's module-level complexity visitor are shared by every
+    metric stage instead of each radon/vulture entry point re-reading the code.
+    """
+
+    def __init__(self, code):
+        self.code = code
+        self.raw = None
+        self.tree = None
+        self.type_comments = True
+        self._module_complexity = None
+
+    def parse(self):
+        # vulture needs type comments; only a misplaced "# type:" comment fails this parse and not a plain one
+        try:
+            self.tree = ast.parse(self.code, type_comments=True)
+        except SyntaxError:
+            self.tree = ast.parse(self.code)
+            self.type_comments = False
+        return self.tree
+
+    @property
+    def module_complexity(self):
+        if self._module_complexity is None:
+            self._module_complexity = ComplexityVisitor.from_ast(self.tree)
+        return self._module_complexity
+
+    def release(self):
+        self.tree = None
+        self.raw = None
+        self._module_complexity = None
+
+    def maintainability_index(self):
+        """Same value as radon's mi_visit(code, True), from the shared raw metrics, AST and complexity"""
+        if self.raw is None:
+            raise ValueError("raw metrics are unavailable")
+        raw = self.raw
+        comments = (raw.comments + raw.multi) / float(raw.sloc) * 100 if raw.sloc != 0 else 0
+        return mi_compute(h_visit_ast(self.tree).total.volume,
+                          self.module_complexity.total_complexity, raw.lloc, comments)
+
+
+def _node_length(node):
+    if hasattr(node, 'end_lineno'):
+        return node.end_lineno - node.lineno + 1
+    last_node = node.body[-1] if node.body else node
+    return (last_node.lineno - node.lineno + 1) if hasattr(last_node, 'lineno') else 0
+
+
+class DefinitionInfo:
+    """A function or class found by FileStructureVisitor"""
+
+    def __init__(self, node, owner, depth, position):
+        self.node = node
+        self.name = node.name
+        self.lineno = node.lineno
+        # Enclosing class for methods (and for classes nested in a class body), None otherwise
+        self.owner = owner
+        self.class_name = owner.name if owner is not None else None
+        self.length = _node_length(node)
+        self.parameter_count = len(node.args.args) if not isinstance(node, ast.ClassDef) else 0
+        self.max_nesting = 0
+        # Sorting by (depth, position) reproduces ast.walk's breadth-first order
+        self.walk_order = (depth, position)
+
+    @property
+    def is_class(self):
+        return isinstance(self.node, ast.ClassDef)
+
+
+class FileStructureVisitor(ast.NodeVisitor):
+    """
+    Single pass over a module that collects every function and class with
+    its owner, length, parameter count and nesting depth. Expressions are
+    skipped since they cannot contain definitions or control flow.
+    """
+
+    def __init__(self):
+        self.functions = []
+        self.classes = []
+        self._depth = 0
+        self._function_stack = []
+        self._owners = [None]
+        self._control_depth = 0
+        self._elif_branches = set()
+        self._position = 0
+
+    @property
+    def definitions(self):
+        """Classes and functions in ast.walk order"""
+        return sorted(self.classes + self.functions, key=lambda info: info.walk_order)
+
+    def visit(self, node):
+        self._position += 1
+        return super().visit(node)
+
+    def generic_visit(self, node):
+        self._depth += 1
+        for child in ast.iter_child_nodes(node):
+            if not isinstance(child, ast.expr):
+                self.visit(child)
+        self._depth -= 1
+
+    def _new_definition(self, node):
+        return DefinitionInfo(node, self._owners[-1], self._depth, self._position)
+
+    def visit_ClassDef(self, node):
+        info = self._new_definition(node)
+        # Whether the nearest enclosing scope is a function rather than the module or a class
+        info.in_function = len(self._owners) > 1 and self._owners[-1] is None
+        self.classes.append(info)
+        self._owners.append(info)
+        self.generic_visit(node)
+        self._owners.pop()
+
+    def visit_FunctionDef(self, node):
+        info = self._new_definition(node)
+        self.functions.append(info)
+        # Nesting is measured from the function itself; nested functions get their own depth
+        saved_depth = self._control_depth
+        self._control_depth = 0
+        self._function_stack.append(info)
+        self._owners.append(None)
+        self.generic_visit(node)
+        self._owners.pop()
+        self._function_stack.pop()
+        self._control_depth = saved_depth
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_nesting(self, node):
+        # Depth is the number of control-flow statements enclosing this one within the function
+        current = self._function_stack[-1] if self._function_stack else None
+        if current is not None:
+            current.max_nesting = max(current.max_nesting, self._control_depth)
+        self._control_depth += 1
+        self.generic_visit(node)
+        self._control_depth -= 1
+
+    def visit_If(self, node):
+        orelse = node.orelse
+        if len(orelse) == 1 and isinstance(orelse[0], ast.If) and orelse[0].col_offset == node.col_offset:
+            self._elif_branches.add(orelse[0])
+        if node in self._elif_branches:
+            # An elif sits at the same level as its if, which already counted this depth
+            self._elif_branches.discard(node)
+            self.generic_visit(node)
+        else:
+            self.visit_nesting(node)
+
+    visit_For = visit_AsyncFor = visit_While = visit_nesting
+    visit_With = visit_AsyncWith = visit_Try = visit_TryStar = visit_Match = visit_nesting
+
+
+LIST_BUILDERS = {"list", "sorted"}
+MUTATING_METHODS = {"append", "extend", "insert", "pop", "remove", "clear", "add", "update", "discard",
+                    "popitem", "setdefault"}
+ITERATION_WRAPPERS = {"enumerate", "reversed", "sorted", "list", "tuple", "set", "iter"}
+
+
+def _cost_class(exponent):
+    """Big-O class for `exponent` nested linear factors"""
+    if exponent == 0:
+        return "O(1)"
+    return "O(n)" if exponent == 1 else f"O(n^{exponent})"
+
+
+NESTED_SCOPE_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+
+
+def _walk_scope(nodes):
+    """ast.walk over statements without entering nested functions, classes or lambdas"""
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        yield node
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                stack.extend(child for child in value
+                             if isinstance(child, ast.AST) and not isinstance(child, NESTED_SCOPE_TYPES))
+            elif isinstance(value, ast.AST) and not isinstance(value, NESTED_SCOPE_TYPES):
+                stack.append(value)
+
+
+def _is_list_expr(node):
+    if isinstance(node, (ast.List, ast.ListComp)):
+        return True
+    return (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id in LIST_BUILDERS)
+
+
+def _is_str_expr(node):
+    if isinstance(node, ast.JoinedStr) or (isinstance(node, ast.Constant) and isinstance(node.value, str)):
+        return True
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "str":
+        return True
+    return isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add) and (
+        _is_str_expr(node.left) or _is_str_expr(node.right))
+
+
+def _root_name(node):
+    """`a` for a, a.b, a[i].c and the like; None when the chain starts at a call or literal"""
+    while isinstance(node, (ast.Attribute, ast.Subscript)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+class _LoopScope:
+    """
+    One enclosing loop or comprehension: the collection it walks, the names
+    its target binds on every pass, the names its body rebinds and the names
+    whose contents it may resize
+    """
+
+    def __init__(self, collection, node, target=None):
+        self.collection = collection
+        self.node = node
+        self.targets = {child.id for child in ast.walk(target) if isinstance(child, ast.Name)} if target else set()
+        self._rebound = None
+        self._mutated = None
+
+    @property
+    def rebound(self):
+        if self._rebound is None:
+            self._scan()
+        return self._rebound
+
+    @property
+    def mutated(self):
+        if self._mutated is None:
+            self._scan()
+        return self._mutated
+
+    def _scan(self):
+        # Only loops that contain a len() or dotted lookup are ever scanned
+        rebound, mutated = set(), set()
+        for child in ast.walk(self.node):
+            if isinstance(child, ast.Name) and not isinstance(child.ctx, ast.Load):
+                rebound.add(child.id)
+            elif isinstance(child, ast.Attribute) and not isinstance(child.ctx, ast.Load):
+                rebound.add(_root_name(child))
+            elif isinstance(child, ast.Subscript) and not isinstance(child.ctx, ast.Load):
+                mutated.add(_root_name(child))
+            elif (isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute)
+                  and child.func.attr in MUTATING_METHODS):
+                mutated.add(_root_name(child.func.value))
+        self._rebound, self._mutated = rebound, mutated | rebound
+
+
+class PerformanceVisitor(ast.NodeVisitor):
+    """
+    AST lint for algorithmic anti-patterns: membership tests on lists,
+    string building with + and loop-invariant len() or dotted lookups inside
+    loops, nested loops over the same collection, branching recursion
+    without memoization and pandas iterrows(). Each finding records the loop
+    nesting it sits at and the cost class that implies, as
+    (type, line, function, class name, detail, cost class, loop depth).
+    """
+
+    MEMO_HINTS = ("cache", "memo")
+
+    def __init__(self):
+        self.findings = []
+        self._function = None
+        self._class_name = None
+        self._loops = []
+        self._lists = set()
+        self._strings = set()
+        self._lengths = {}
+        self._reported = set()
+
+    def visit_Module(self, node):
+        self._lists, self._strings, self._lengths, _ = self._scan_scope(node.body, ())
+        self.generic_visit(node)
+
+    def generic_visit(self, node):
+        # ast.NodeVisitor.generic_visit minus iter_fields, and without descending into Load/Store markers
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, ast.AST):
+                        self.visit(item)
+            elif isinstance(value, ast.AST) and not isinstance(value, ast.expr_context):
+                self.visit(value)
+
+    def _report(self, kind, node, detail, exponent):
+        # One finding per function, kind and subject keeps a hot loop from flooding the report
+        dedupe_key = (self._function, self._class_name, kind, detail)
+        if dedupe_key in self._reported:
+            return
+        self._reported.add(dedupe_key)
+        cost = exponent if isinstance(exponent, str) else _cost_class(exponent)
+        name = self._function.name if self._function is not None else None
+        self.findings.append((kind, node.lineno, name, self._class_name, detail, cost, len(self._loops)))
+
+    def _scan_scope(self, body, arguments):
+        """
+        One pass over a scope: the names that only ever hold lists or
+        strings, names assigned len(collection) with the collection they
+        measure, and the scope's calls
+        """
+        lists, strings, other = set(), set(), set()
+        lengths = {}
+        calls = []
+        for arg in arguments:
+            annotation = arg.annotation
+            if isinstance(annotation, ast.Subscript):
+                annotation = annotation.value
+            if isinstance(annotation, ast.Name) and annotation.id in ("list", "List"):
+                lists.add(arg.arg)
+            elif isinstance(annotation, ast.Name) and annotation.id == "str":
+                strings.add(arg.arg)
+            else:
+                other.add(arg.arg)
+        for node in _walk_scope(body):
+            if isinstance(node, ast.Call):
+                calls.append(node)
+                continue
+            if isinstance(node, ast.Assign):
+                targets, value = node.targets, node.value
+            elif isinstance(node, ast.AnnAssign) and node.value is not None:
+                targets, value = [node.target], node.value
+            else:
+                continue
+            for target in targets:
+                if not isinstance(target, ast.Name):
+                    continue
+                if (isinstance(value, ast.Call) and isinstance(value.func, ast.Name)
+                        and value.func.id == "len" and len(value.args) == 1):
+                    lengths[target.id] = value.args[0]
+                if _is_list_expr(value):
+                    lists.add(target.id)
+                elif _is_str_expr(value):
+                    strings.add(target.id)
+                elif not (isinstance(value, ast.BinOp) and isinstance(value.left, ast.Name)
+                          and value.left.id == target.id):
+                    other.add(target.id)  # s = s + ... keeps whatever s already was
+        return lists - other, strings - other, lengths, calls
+
+    def _collection(self, node):
+        """The collection a loop walks: `a` for `a`, enumerate(a), a.items() or range(len(a))"""
+        while isinstance(node, ast.Call):
+            func = node.func
+            if isinstance(func, ast.Name) and func.id == "range":
+                for arg in node.args:
+                    for child in ast.walk(arg):
+                        if (isinstance(child, ast.Call) and isinstance(child.func, ast.Name)
+                                and child.func.id == "len" and len(child.args) == 1):
+                            return child.args[0]
+                        if isinstance(child, ast.Name) and child.id in self._lengths:
+                            return self._lengths[child.id]
+                return None
+            if isinstance(func, ast.Name) and func.id in ITERATION_WRAPPERS and node.args:
+                node = node.args[0]
+            elif isinstance(func, ast.Attribute) and func.attr in ("items", "keys", "values"):
+                node = func.value
+            else:
+                return None
+        if isinstance(node, (ast.Name, ast.Attribute, ast.Subscript)):
+            return node
+        return None
+
+    def _enter_loop(self, node, iterable, line_node, target=None):
+        collection = self._collection(iterable)
+        key = ast.dump(collection) if collection is not None else None
+        if key is not None and self._walks_again(key, collection):
+            self._report("Nested Loops Over Same Collection", line_node,
+                         f"nested loops over {ast.unparse(collection)}", len(self._loops) + 1)
+        self._loops.append(_LoopScope(key, node, target))
+
+    def _walks_again(self, key, collection):
+        """
+        Whether an enclosing loop walks the same collection. A name that a
+        loop target rebinds on the way in (for token in token, a tree walk)
+        names a different object by then, so it does not count.
+        """
+        names = {child.id for child in ast.walk(collection) if isinstance(child, ast.Name)}
+        for loop in reversed(self._loops):
+            if names & loop.targets:
+                return False
+            if loop.collection == key:
+                return True
+        return False
+
+    def visit_FunctionDef(self, node):
+        saved = (self._function, self._loops, self._lists, self._strings, self._lengths)
+        arguments = node.args.posonlyargs + node.args.args + node.args.kwonlyargs
+        self._function, self._loops = node, []
+        self._lists, self._strings, self._lengths, calls = self._scan_scope(node.body, arguments)
+        self._check_recursion(node, arguments, calls)
+        self.generic_visit(node)
+        self._function, self._loops, self._lists, self._strings, self._lengths = saved
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        saved = self._class_name
+        self._class_name = node.name
+        self.generic_visit(node)
+        self._class_name = saved
+
+    def _check_recursion(self, node, arguments, calls):
+        """Two or more self-calls on shrinking arguments (fib(n - 1) + fib(n - 2)) without a cache"""
+        parameters = {arg.arg for arg in arguments}
+        recursive_calls = 0
+        for child in calls:
+            func = child.func
+            is_self_call = (isinstance(func, ast.Name) and func.id == node.name) or (
+                isinstance(func, ast.Attribute) and func.attr == node.name
+                and isinstance(func.value, ast.Name) and func.value.id in ("self", "cls"))
+            shrinking = any(isinstance(arg, ast.BinOp) and any(
+                isinstance(name, ast.Name) and name.id in parameters for name in ast.walk(arg))
+                for arg in child.args)
+            if is_self_call and shrinking:
+                recursive_calls += 1
+        if recursive_calls < 2:
+            return
+
+        # A cache decorator or a memo table anywhere in the function counts as memoization
+        hints = [ast.unparse(decorator).lower() for decorator in node.decorator_list]
+        hints += [child.id.lower() for child in _walk_scope(node.body) if isinstance(child, ast.Name)]
+        hints += [name.lower() for name in parameters]
+        if any(hint in name for name in hints for hint in self.MEMO_HINTS):
+            return
+        self._report("Unmemoized Recursion", node, f"{recursive_calls} recursive calls per level without memoization",
+                     f"O({recursive_calls}^n)")
+
+    def visit_For(self, node):
+        self.visit(node.iter)
+        self._enter_loop(node, node.iter, node, node.target)
+        for child in node.body:
+            self.visit(child)
+        self._loops.pop()
+        for child in node.orelse:
+            self.visit(child)
+
+    visit_AsyncFor = visit_For
+
+    def visit_While(self, node):
+        # The condition runs on every iteration, so it belongs inside the loop
+        self._enter_loop(node, node.test, node)
+        self.visit(node.test)
+        for child in node.body:
+            self.visit(child)
+        self._loops.pop()
+        for child in node.orelse:
+            self.visit(child)
+
+    def visit_comprehension_node(self, node):
+        entered = 0
+        for generator in node.generators:
+            self.visit(generator.iter)
+            self._enter_loop(node, generator.iter, node, generator.target)
+            entered += 1
+            for condition in generator.ifs:
+                self.visit(condition)
+        for field in ("elt", "key", "value"):
+            if hasattr(node, field):
+                self.visit(getattr(node, field))
+        del self._loops[len(self._loops) - entered:]
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = visit_comprehension_node
+
+    def visit_Compare(self, node):
+        if self._loops:
+            for op, comparator in zip(node.ops, node.comparators):
+                if not isinstance(op, (ast.In, ast.NotIn)):
+                    continue
+                if isinstance(comparator, ast.ListComp) or (
+                        isinstance(comparator, ast.Name) and comparator.id in self._lists):
+                    self._report("List Membership In Loop", node,
+                                 f"'in' scans list {ast.unparse(comparator)} inside a loop", len(self._loops) + 1)
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node):
+        target = node.target
+        if (self._loops and isinstance(node.op, ast.Add) and isinstance(target, ast.Name)
+                and (target.id in self._strings or _is_str_expr(node.value))):
+            self._report("String Concatenation In Loop", node,
+                         f"string {target.id} built with += inside a loop", len(self._loops) + 1)
+        self.generic_visit(node)
+
+    def visit_Assign(self, node):
+        value = node.value
+        if (self._loops and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)
+                and isinstance(value, ast.BinOp) and isinstance(value.op, ast.Add)
+                and isinstance(value.left, ast.Name) and value.left.id == node.targets[0].id
+                and (value.left.id in self._strings or _is_str_expr(value.right))):
+            self._report("String Concatenation In Loop", node,
+                         f"string {value.left.id} built with + inside a loop", len(self._loops) + 1)
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        func = node.func
+        if (self._loops and isinstance(func, ast.Name) and func.id == "len" and len(node.args) == 1
+                and not isinstance(node.args[0], (ast.Call, ast.ListComp, ast.List, ast.Constant))):
+            # len(m[k]) changes with k, so any name a loop target or the loop body binds makes it vary
+            root = _root_name(node.args[0])
+            names = {child.id for child in ast.walk(node.args[0]) if isinstance(child, ast.Name)}
+            if (root is not None and not names & self._loops[-1].mutated
+                    and not any(names & loop.targets for loop in self._loops)):
+                self._report("Repeated Lookup In Loop", node,
+                             f"len({ast.unparse(node.args[0])}) recomputed inside a loop", len(self._loops))
+        if isinstance(func, ast.Attribute) and func.attr == "iterrows" and not node.args:
+            self._report("Pandas iterrows", node,
+                         f"{ast.unparse(func.value)}.iterrows() walks rows in Python", len(self._loops) + 1)
+        self.generic_visit(node)
+
+    def visit_Attribute(self, node):
+        # Dotted lookups such as self.items.append or os.path.join resolve every attribute on every iteration
+        chain = node
+        dots = 0
+        while isinstance(chain, ast.Attribute):
+            chain = chain.value
+            dots += 1
+        if (len(self._loops) >= 2 and dots >= 2 and isinstance(node.ctx, ast.Load)
+                and isinstance(chain, ast.Name) and chain.id not in self._loops[-1].rebound):
+            self._report("Repeated Lookup In Loop", node,
+                         f"{ast.unparse(node)} looked up inside a nested loop", len(self._loops))
+            return
+        self.generic_visit(node)
+
+
+CLONE_UNIT_TYPES = {
+    getattr(ast, node_type): kind for node_type, kind in (
+        ("FunctionDef", "function"), ("AsyncFunctionDef", "function"), ("If", "if"), ("For", "for"),
+        ("AsyncFor", "for"), ("While", "while"), ("With", "with"), ("AsyncWith", "with"), ("Try", "try"),
+        ("TryStar", "try"), ("Match", "match"))
+    if hasattr(ast, node_type)  # try/except* and match only exist on newer Pythons
+}
+
+
+def _clone_fingerprints(tree, min_lines):
+    """
+    Fingerprint every function and compound-statement block spanning at
+    least `min_lines` lines. The tree is serialized once, in pre-order, as
+    node types only (identifiers and literal values are abstracted away),
+    and each unit's fingerprint is the hash of its slice of that stream.
+    Returns [digest, kind, name, line, endLine, parent] per unit in
+    pre-order; `parent` is the index of the enclosing unit or -1.
+    Notebook units get their cell and line within it appended.
+    """
+    tokens = []
+    units = []
+    starts = []
+    open_units = []
+    stack = [tree]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, int):  # end of the unit with this index
+            tokens.append(")")
+            open_units.pop()
+            units[item][0] = hashlib.blake2b("\x1f".join(tokens[starts[item]:]).encode("ascii"),
+                                             digest_size=10).hexdigest()
+            continue
+        if isinstance(item, str):
+            tokens.append(item)
+            continue
+
+        tokens.append(type(item).__name__)
+        kind = CLONE_UNIT_TYPES.get(type(item))
+        if kind is not None and item.end_lineno - item.lineno + 1 >= min_lines:
+            index = len(units)
+            name = item.name if kind == "function" else kind
+            units.append([None, kind, name, item.lineno, item.end_lineno, open_units[-1] if open_units else -1])
+            starts.append(len(tokens) - 1)
+            open_units.append(index)
+            stack.append(index)
+        else:
+            stack.append(")")
+        for field in reversed(item._fields):
+            value = getattr(item, field, None)
+            if isinstance(value, list):
+                stack.extend(child for child in reversed(value) if isinstance(child, ast.AST))
+                stack.append("[")  # list fields are delimited so If(body=[a, b]) != If(body=[a], orelse=[b])
+            elif isinstance(value, ast.AST):
+                stack.append(value)
+    return units
+
+
+class CloneIndex:
+    """
+    Project-wide index of clone fingerprints. Units are bucketed by hash as
+    records go by, so finding clones is linear in the number of units;
+    every bucket holding two or more units is a clone group. The groups
+    are kept until a file's units actually change.
+    """
+
+    def __init__(self):
+        self.buckets = defaultdict(list)
+        self.units = {}
+        self.cached_groups = None
+
+    def add(self, path, units):
+        if path in self.units and self.units[path] == units:
+            return  # same fingerprints at the same lines, the groups still hold
+        self.remove(path)
+        self.units[path] = units
+        self.cached_groups = None
+        for index, unit in enumerate(units):
+            self.buckets[unit[0]].append((path, index))
+
+    def remove(self, path):
+        if path in self.units:
+            self.cached_groups = None
+        for unit in self.units.pop(path, ()):
+            bucket = self.buckets[unit[0]]
+            bucket[:] = [location for location in bucket if location[0] != path]
+            if not bucket:
+                del self.buckets[unit[0]]
+
+    def _inside_group(self, path, index, members):
+        parent = self.units[path][index][5]
+        while parent != -1:
+            if (path, parent) in members:
+                return True
+            parent = self.units[path][parent][5]
+        return False
+
+    def _location(self, path, unit):
+        location = {"path": path, "name": unit[2], "line": unit[3], "endLine": unit[4]}
+        if len(unit) > 6:  # notebook units also carry their cell and the line within it
+            location["cell"], location["cellLine"] = unit[6], unit[7]
+        return location
+
+    def groups(self):
+        """
+        Clone groups, largest first. A group whose every unit lies inside a
+        unit of a larger group (a block of a cloned function, say) adds
+        nothing and is left out.
+        """
+        if self.cached_groups is None:
+            self.cached_groups = self._find_groups()
+        return self.cached_groups
+
+    def _find_groups(self):
+        candidates = []
+        for bucket in self.buckets.values():
+            if len(bucket) < 2:
+                continue
+            locations = sorted(bucket, key=lambda location: (_walk_order_key(location[0]), location[1]))
+            lines = max(self.units[path][index][4] - self.units[path][index][3] + 1 for path, index in locations)
+            candidates.append((lines, locations))
+        candidates.sort(key=lambda candidate: (-candidate[0], _walk_order_key(candidate[1][0][0]), candidate[1][0][1]))
+
+        members = set()
+        groups = []
+        for lines, locations in candidates:
+            if all(self._inside_group(path, index, members) for path, index in locations):
+                continue
+            members.update(locations)
+            groups.append({
+                "kind": self.units[locations[0][0]][locations[0][1]][1],
+                "lines": lines,
+                "locations": [self._location(path, self.units[path][index]) for path, index in locations]
+            })
+        return groups
+
 
 class CodeAnalyzer:
+    # Paths listed per skip reason in the summary; the count covers the rest
+    SKIPPED_PATHS_LISTED = 100
+
     def __init__(self):
         self.smell_counts = defaultdict(int)
         self.smell_thresholds = {
@@ -20,11 +1753,22 @@ class CodeAnalyzer:
             'many_methods': 10,
             'high_complexity': 10,
             'inconsistent_names': True,
-            'dead_code': 0
+            'dead_code': 0,
+            'duplicate_code': 6  # minimum lines of a function or block considered for clone detection
         }
+        self.discovery_options = {}
+        self.skipped_files = {}
+        self.skipped_generated = []
+        self.phase_times = {}
+        self.collect_timings = False
+        self.max_memory = None
+        self.history_file = None
+        self.shard = None  # (index, count), 1-based
+        self.chunked = False
+        self.reads_in_flight = DEFAULT_READS_IN_FLIGHT
+        self.tier = "full"
         self.analysis_results = {
             "projectName": "",
-            "files": [],
             "summary": {
                 "totalFiles": 0,
                 "totalLines": 0,
@@ -37,20 +1781,298 @@ class CodeAnalyzer:
             }
         }
 
-    def analyze_directory(self, directory_path):
+    def analyze_directory(self, directory_path, jobs=None, cache_file=None, stream=False):
         self.analysis_results["projectName"] = os.path.basename(os.path.abspath(directory_path))
-        
-        for root, _, files in os.walk(directory_path):
-            for file in files:
-                if file.endswith('.py'):
-                    file_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(file_path, directory_path)
-                    self.analyze_file(file_path, relative_path)
+        self.phase_times = {}
+
+        phase_start = time.perf_counter()
+        file_list = self.discover_files(directory_path)
+        self.phase_times["discovery"] = time.perf_counter() - phase_start
+        if self.skipped_files:
+            print("Skipped during discovery: " + ", ".join(
+                f"{reason} {count}" for reason, count in sorted(self.skipped_files.items())))
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+
+        if self.shard is not None:
+            index, count = self.shard
+            file_list = [entry for entry in file_list if _shard_of(entry[1], count) == index]
+
+        cache = AnalysisCache(cache_file, self.smell_thresholds, self.tier) if cache_file else None
+        records = self.collect_records(file_list, jobs, cache)
+
+        if self.shard is not None:
+            self.write_partial_results(directory_path, records, cache)
+        else:
+            self.write_results(directory_path, records, cache, stream)
+
+    def write_partial_results(self, directory_path, records, cache=None):
+        """
+        Write this shard's records before dead code resolution, with the smell
+        counts each produced, as JSON lines. merge_partial_reports turns a full
+        set of shards into the report a single run would have written.
+        """
+        index, count = self.shard
+        output_path = os.path.join(directory_path, f"complexity_report.shard-{index}-of-{count}.jsonl")
+        phase_start = time.perf_counter()
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({
+                "projectName": self.analysis_results["projectName"],
+                "shard": {"index": index, "count": count},
+                "analyzerVersion": ANALYZER_VERSION,
+                "thresholds": self.smell_thresholds,
+                "tier": self.tier,
+                "skippedGenerated": self.skipped_generated
+            }) + '\n')
+            for file_data, smell_counts in records:
+                if file_data is not None:
+                    f.write(json.dumps({"record": file_data, "smellCounts": smell_counts}) + '\n')
+        if cache is not None:
+            cache.save()
+        self.phase_times["analysis"] = time.perf_counter() - phase_start
+        print(f"\nPartial results for shard {index}/{count} saved to: {output_path}")
+
+    def merge_partial_reports(self, partial_paths, directory_path, stream=False):
+        """
+        Combine the partial reports of every shard into complexity_report.json.
+        Shards are merged back into discovery order and then go through the
+        same dead code, summary and writing pass as a single-machine run.
+        """
+        headers = []
+        readers = []
+        for partial_path in partial_paths:
+            header, reader = self._read_partial_report(partial_path)
+            headers.append(header)
+            readers.append(reader)
+
+        count = headers[0]["shard"]["count"]
+        indexes = sorted(header["shard"]["index"] for header in headers)
+        if any(header["shard"]["count"] != count for header in headers) or indexes != list(range(1, count + 1)):
+            raise ValueError(f"expected shards 1..{count} exactly once, got {indexes}")
+        for header in headers:
+            if (header["analyzerVersion"] != ANALYZER_VERSION or header["thresholds"] != headers[0]["thresholds"]
+                    or header["tier"] != headers[0]["tier"]):
+                raise ValueError("partial reports were produced by different analyzer versions or settings")
+
+        self.analysis_results["projectName"] = headers[0]["projectName"]
+        self.smell_thresholds = headers[0]["thresholds"]
+        self.tier = headers[0]["tier"]
+        # Every shard walks the whole tree, so any header lists all generated files
+        self.skipped_generated = headers[0]["skippedGenerated"]
+        self.phase_times = {}
+        records = heapq.merge(*readers, key=lambda item: _walk_order_key(item[0]["path"]))
+        self.write_results(directory_path, records, stream=stream)
 
-        self.calculate_project_metrics()
-        self.save_results_to_json(directory_path)
+    def _read_partial_report(self, partial_path):
+        with open(partial_path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline())
 
-    def analyze_file(self, file_path, relative_path):
+        def read_records():
+            with open(partial_path, 'r', encoding='utf-8') as f:
+                f.readline()
+                for line in f:
+                    entry = json.loads(line)
+                    yield entry["record"], entry["smellCounts"]
+
+        return header, read_records()
+
+    def write_results(self, directory_path, records, cache=None, stream=False):
+        """
+        Finish the run without holding every record as nested dicts. Records
+        are kept compact in a RecordStore (spilled to disk beyond max_memory,
+        or right away when streaming) while the project-wide name index is
+        built, then each is finalized with its dead code and written out.
+        """
+        used_names = set()
+        clone_index = CloneIndex()
+        rollups = DirectoryRollups()
+        history = None
+        if self.history_file:
+            history = HistoryDatabase(self.history_file)
+            history.start_run(self.analysis_results["projectName"], directory_path, self.tier)
+        phase_start = time.perf_counter()
+        with RecordStore(0 if stream else self.max_memory) as store:
+            for file_data, smell_counts in records:
+                if file_data is None:
+                    continue
+                for smell, count in smell_counts.items():
+                    self.smell_counts[smell] += count
+                symbols = file_data.get("symbols", {})
+                used_names.update(symbols.get("uses", []))
+                clone_index.add(file_data["path"], symbols.get("clones", []))
+                rollups.add(file_data["path"], DirectoryRollups.contribution(file_data, smell_counts))
+                store.append(file_data)
+
+            if cache is not None:
+                cache.save()
+            self.phase_times["analysis"] = time.perf_counter() - phase_start
+
+            # Dead code resolution, summary totals and writing are interleaved per record here;
+            # dead code is timed per record and taken out of the write phase
+            phase_start = time.perf_counter()
+            dead_code_time = 0
+            totals = ProjectTotals()
+            timing_stats = TimingStats()
+            output_path = os.path.join(directory_path, "complexity_report.json")
+            writers = [StreamingReportWriter(output_path, self.analysis_results["projectName"],
+                                             indent=None if stream else 2)]
+            if self.chunked:
+                writers.append(ChunkedReportWriter(os.path.join(directory_path, "complexity_report"),
+                                                   self.analysis_results["projectName"]))
+            for file_data in store:
+                dead_code_start = time.perf_counter()
+                self.resolve_dead_code(file_data, used_names)
+                dead_code_time += time.perf_counter() - dead_code_start
+                if file_data["deadCode"]:
+                    rollups.add(file_data["path"], Counter({"smell:dead_code": len(file_data["deadCode"])}))
+                totals.add(file_data)
+                timing_stats.add(file_data)
+                for writer in writers:
+                    writer.write_record(file_data)
+                if history is not None:
+                    history.add_file(file_data)
+
+        summary_start = time.perf_counter()
+        clone_groups = clone_index.groups()
+        self.analysis_results["summary"] = self.build_summary(totals, clone_groups)
+        directories = rollups.summary(self)
+        self.phase_times["deadCode"] = dead_code_time
+        self.phase_times["summary"] = time.perf_counter() - summary_start
+        if cache is not None:
+            self.analysis_results["summary"]["cache"] = {"hits": cache.hits, "misses": cache.misses}
+        if self.collect_timings:
+            self.add_timing_summary(timing_stats)
+        for writer in writers:
+            writer.close(self.analysis_results["summary"], clone_groups, directories)
+        if history is not None:
+            history.finish_run(self.analysis_results["summary"])
+            history.close()
+            print(f"Run {history.run_id} recorded in {self.history_file}")
+        self.phase_times["write"] = (time.perf_counter() - phase_start
+                                     - self.phase_times["deadCode"] - self.phase_times["summary"])
+        print(f"\nAnalysis results saved to: {output_path}")
+
+    def add_timing_summary(self, timing_stats):
+        """Attach aggregated timings to the summary and list the slowest files on the console"""
+        timings = timing_stats.summary(self.phase_times)
+        self.analysis_results["summary"]["timings"] = timings
+        if timings["slowestFiles"]:
+            print("\nSlowest files to analyze:")
+            for entry in timings["slowestFiles"]:
+                print(f"  {entry['wall']:.4f}s  {entry['path']}  (mostly {entry['slowestPhase']})")
+
+    def discover_files(self, directory_path):
+        """Collect (file_path, relative_path) pairs in a deterministic walk order"""
+        discovery = FileDiscovery(directory_path, **self.discovery_options)
+        file_list = list(discovery.walk())
+        self.skipped_files = dict(discovery.skipped)
+        self.skipped_generated = discovery.generated
+        return file_list
+
+    def collect_records(self, file_list, jobs, cache=None):
+        """
+        Yield (file_data, smell_counts) for every file in discovery order.
+        Contents are prefetched on reader threads; unchanged files are served
+        from the cache, the rest are analyzed serially or on a worker pool as
+        their contents arrive.
+        """
+        hashes = deque()
+
+        def tasks():
+            for file_path, relative_path, data, read_time in FilePrefetcher(self.reads_in_flight).read(file_list):
+                content_hash = cache.hash_source(data) if cache is not None else None
+                if cache is not None and cache.contains(content_hash):
+                    hashes.append(None)
+                    yield file_path, relative_path, None, None, cache.lookup(content_hash, file_path, relative_path)
+                else:
+                    hashes.append(content_hash)
+                    yield file_path, relative_path, data, read_time, None
+
+        # Results come back in task order, so the hashes line up with them
+        for file_data, smell_counts in self.analyze_tasks(tasks(), jobs, len(file_list)):
+            content_hash = hashes.popleft()
+            if content_hash is not None and file_data is not None:
+                cache.store(content_hash, file_data, smell_counts)
+            yield file_data, smell_counts
+
+    def analyze_files(self, file_list, jobs):
+        """Read and analyze files serially or across a worker pool, yielding results in input order"""
+        tasks = ((file_path, relative_path, data, read_time, None)
+                 for file_path, relative_path, data, read_time in FilePrefetcher(self.reads_in_flight).read(file_list))
+        return self.analyze_tasks(tasks, jobs, len(file_list))
+
+    def analyze_tasks(self, tasks, jobs, total):
+        """
+        Yield (file_data, smell_counts) for a stream of (file_path, relative_path,
+        data, read_time, cached) tasks in order. Cached results pass straight
+        through. The rest are analyzed serially or sent to the worker pool in
+        batches, with only a couple of batches per worker queued so the reads
+        stay just ahead of the analysis.
+        """
+        jobs = max(1, min(jobs, total))
+        if jobs == 1:
+            for file_path, relative_path, data, read_time, cached in tasks:
+                yield cached if cached is not None else self.analyze_source(file_path, relative_path, data, read_time)
+            return
+
+        batch_size = max(1, min(64, total // (jobs * 4)))
+        queued = deque()
+
+        def submit(batch):
+            work = [task[:4] for task in batch if task[4] is None]
+            queued.append((batch, pool.submit(_analyze_batch_worker, work) if work else None))
+
+        def collect():
+            batch, future = queued.popleft()
+            fresh = iter(future.result() if future is not None else ())
+            for task in batch:
+                yield task[4] if task[4] is not None else next(fresh)
+
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(self.smell_thresholds, self.collect_timings, self.tier)) as pool:
+            batch = []
+            for task in tasks:
+                batch.append(task)
+                if len(batch) == batch_size:
+                    submit(batch)
+                    batch = []
+                    if len(queued) > jobs * 2:
+                        yield from collect()
+            if batch:
+                submit(batch)
+            while queued:
+                yield from collect()
+
+    def analyze_source(self, file_path, relative_path, data, read_time=None):
+        """Analyze prefetched contents; `data` is the file's bytes or the error raised reading it"""
+        try:
+            if isinstance(data, Exception):
+                raise data
+            code = _decode_source(data)
+        except Exception as e:
+            print(f"Error reading file {file_path}: {e}")
+            return None, {}
+        file_data, smell_counts = self.analyze_file_isolated(file_path, relative_path, code)
+        if file_data is not None and "timings" in file_data and read_time is not None:
+            file_data["timings"] = {"read": read_time, **file_data["timings"]}
+        return file_data, smell_counts
+
+    def analyze_file_isolated(self, file_path, relative_path, code=None):
+        """Analyze a single file and return its record with the smell counts it produced"""
+        saved_counts = self.smell_counts
+        self.smell_counts = defaultdict(int)
+        try:
+            file_data = self.analyze_file(file_path, relative_path, code)
+            return file_data, dict(self.smell_counts)
+        finally:
+            self.smell_counts = saved_counts
+
+    def analyze_file(self, file_path, relative_path, code=None):
+        """
+        Analyze one file; `code` can supply the source directly, e.g. a blob
+        read from git. Phases beyond the analyzer's tier are skipped, and the
+        fields only they fill in (maintainabilityIndex, symbols) are left out.
+        """
         file_data = {
             "path": relative_path,
             "fileName": os.path.basename(file_path),
@@ -61,102 +2083,184 @@ class CodeAnalyzer:
             "ownership": defaultdict(list),
             "deadCode": []
         }
+        timer = PhaseTimer() if self.collect_timings else NULL_TIMER
 
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                code = file.read()
-        except Exception as e:
-            print(f"Error reading file {file_path}: {e}")
-            return
+        if code is None:
+            try:
+                with timer.phase("read"):
+                    with open(file_path, 'r', encoding='utf-8') as file:
+                        code = file.read()
+            except Exception as e:
+                print(f"Error reading file {file_path}: {e}")
+                return
+
+        notebook_cells = None
+        if file_path.endswith('.ipynb'):
+            try:
+                code, notebook_cells, skipped_cells = _notebook_source(code)
+            except (ValueError, AttributeError) as e:
+                print(f"Error reading notebook {file_path}: {e}")
+                return
 
-        # Analyze file stats
+        # Tokenize once for the raw metrics; MI reuses them. The quick tier has no MI and only counts lines
+        source = ParsedSource(code)
         try:
-            raw_metrics = analyze(code)
-            file_data["fileStats"] = {
-                "loc": raw_metrics.loc,
-                "comments": raw_metrics.comments,
-                "blank": raw_metrics.blank,
-                "commentRatio": raw_metrics.comments / raw_metrics.loc if raw_metrics.loc > 0 else 0
-            }
+            with timer.phase("rawMetrics"):
+                if self.tier == "quick":
+                    file_data["fileStats"] = _line_stats(code)
+                else:
+                    raw_metrics = source.raw = analyze(code)
+                    file_data["fileStats"] = {
+                        "loc": raw_metrics.loc,
+                        "comments": raw_metrics.comments,
+                        "blank": raw_metrics.blank,
+                        "commentRatio": raw_metrics.comments / raw_metrics.loc if raw_metrics.loc > 0 else 0
+                    }
         except Exception as e:
             print(f"Error in file statistics analysis for {file_path}: {e}")
 
-        # Parse AST and build parent relationships
+        # Parse once, then collect functions, classes and their context in one pass over the tree
         try:
-            tree = ast.parse(code)
-            for node in ast.walk(tree):
-                for child in ast.iter_child_nodes(node):
-                    child.parent = node
+            with timer.phase("parse"):
+                tree = source.parse()
+                structure = FileStructureVisitor()
+                structure.visit(tree)
         except Exception as e:
             print(f"Error parsing AST for {file_path}: {e}")
             return
 
         # Analyze all functions and methods
-        self.analyze_functions_and_methods(file_data, tree, code)
+        with timer.phase("functions"):
+            self.analyze_functions_and_methods(file_data, structure, source)
 
-        # Calculate maintainability index
-        try:
-            mi = mi_visit(code, True)
-            file_data["maintainabilityIndex"] = round(mi, 2)
-        except Exception as e:
-            print(f"Error in maintainability index calculation for {file_path}: {e}")
+        if self.tier == "quick":
+            del file_data["maintainabilityIndex"]
+        else:
+            # Calculate maintainability index
+            try:
+                with timer.phase("maintainability"):
+                    mi = source.maintainability_index()
+                file_data["maintainabilityIndex"] = round(mi, 2)
+            except Exception as e:
+                print(f"Error in maintainability index calculation for {file_path}: {e}")
+
+            # Analyze code smells
+            with timer.phase("smells"):
+                complexity_index = self._build_complexity_index(file_data)
+                self.analyze_code_smells(file_data, structure, complexity_index)
+
+            # Algorithmic anti-patterns, reported as smells with the cost class of their loop nesting
+            with timer.phase("performance"):
+                self.analyze_performance(file_data, source, complexity_index)
+
+        if self.tier == "full":
+            # Collect definitions and references for project-wide dead code detection
+            with timer.phase("symbols"):
+                self.collect_symbols(file_data, structure, source, file_path)
+
+            # Fingerprint functions and blocks for project-wide clone detection
+            with timer.phase("clones"):
+                self.collect_clone_units(file_data, source, file_path)
+
+        # Drop the AST and everything pointing into it before the next file is read
+        source.release()
+        del tree, structure
+
+        if notebook_cells is not None:
+            self.map_notebook_lines(file_data, notebook_cells)
+            file_data["notebook"] = {"cells": notebook_cells, "skippedCells": skipped_cells}
 
-        # Analyze code smells
-        self.analyze_code_smells(file_data, tree)
+        if self.collect_timings:
+            file_data["timings"] = timer.phases
 
-        # Analyze dead code
-        self.analyze_dead_code(file_data, tree, code, file_path)
+        return file_data
 
-        self.analysis_results["files"].append(file_data)
+    def map_notebook_lines(self, file_data, cells):
+        """Point each smell, function and clone unit of a notebook at its cell and the line within that cell"""
+        if not cells:
+            return
+        first_lines = [first_line for _, first_line, _ in cells]
+
+        def position(line):
+            cell_index, first_line, _ = cells[max(0, bisect.bisect_right(first_lines, line) - 1)]
+            return cell_index, line - first_line + 1
 
-    def analyze_functions_and_methods(self, file_data, tree, code):
+        for item in file_data["smells"] + file_data["complexity"]:
+            if isinstance(item.get("line"), int):
+                item["cell"], item["cellLine"] = position(item["line"])
+        for unit in file_data.get("symbols", {}).get("clones", []):
+            unit.extend(position(unit[3]))
+
+    def analyze_functions_and_methods(self, file_data, structure, source):
         """Analyze all functions and methods for complexity"""
         try:
-            functions = []
-            classes = []
-            
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    functions.append(node)
-                elif isinstance(node, ast.ClassDef):
-                    classes.append(node)
+            block_complexity = self._collect_block_complexity(source, structure)
+            functions = sorted(structure.functions, key=lambda info: info.walk_order)
 
             # Analyze standalone functions
             for func in functions:
-                if not isinstance(func.parent, ast.ClassDef):
-                    self.analyze_function_complexity(file_data, func, code, is_method=False)
+                if func.class_name is None:
+                    self.analyze_function_complexity(file_data, func, block_complexity)
 
-            # Analyze class methods
-            for class_node in classes:
-                for node in ast.walk(class_node):
-                    if isinstance(node, ast.FunctionDef):
-                        self.analyze_function_complexity(file_data, node, code, is_method=True)
+            # Analyze class methods, grouped by class
+            methods = defaultdict(list)
+            for func in functions:
+                if func.owner is not None:
+                    methods[func.owner].append(func)
+            for class_info in sorted(structure.classes, key=lambda info: info.walk_order):
+                for func in methods[class_info]:
+                    self.analyze_function_complexity(file_data, func, block_complexity)
 
         except Exception as e:
             print(f"Error analyzing functions/methods: {e}")
 
-    def analyze_function_complexity(self, file_data, func_node, code, is_method):
+    def _collect_block_complexity(self, source, structure):
+        """Map (line, class, name) of every radon block to its complexity using one pass over the module"""
+        complexity = {}
+        # radon drops classes defined inside function bodies, so those get a pass of their own
+        roots = [ast.Module(body=[info.node], type_ignores=[])
+                 for info in structure.classes if info.in_function]
+        try:
+            pending = list(source.module_complexity.blocks)
+            pending.extend(block for root in roots for block in cc_visit_ast(root))
+        except Exception as e:
+            print(f"Error in module complexity analysis: {e}")
+            return complexity
+        while pending:
+            block = pending.pop()
+            if isinstance(block, Function):
+                complexity[(block.lineno, block.classname, block.name)] = block.complexity
+                pending.extend(block.closures)
+            else:
+                pending.extend(block.methods)
+                pending.extend(block.inner_classes)
+        return complexity
+
+    def analyze_function_complexity(self, file_data, func_info, block_complexity):
         """Analyze complexity of a single function/method"""
         try:
-            func_code = ast.unparse(func_node)
-            cc_results = cc_visit(func_code)
-            if not cc_results:
-                return
-                
-            block = cc_results[0]
-            class_name = None
-            if is_method:
-                class_name = func_node.parent.name if hasattr(func_node, 'parent') and isinstance(func_node.parent, ast.ClassDef) else None
+            value = block_complexity.get((func_info.lineno, func_info.class_name, func_info.name))
+            if value is None:
+                cc_results = cc_visit_ast(ast.Module(body=[func_info.node], type_ignores=[]))
+                if not cc_results:
+                    return
+                value = cc_results[0].complexity
+
+            is_method = func_info.class_name is not None
+            node = func_info.node
 
             complexity_data = {
-                "name": block.name,
-                "value": block.complexity,
+                "name": func_info.name,
+                "value": value,
                 "type": "method" if is_method else "function",
-                "class": class_name,
+                "class": func_info.class_name,
+                # First line including decorators, which is what profilers report as co_firstlineno
+                "line": min([node.lineno] + [decorator.lineno for decorator in node.decorator_list]),
+                "endLine": node.end_lineno,
                 "issues": []
             }
             
-            if block.complexity > self.smell_thresholds['high_complexity']:
+            if value > self.smell_thresholds['high_complexity']:
                 complexity_data["issues"].append(f"High complexity (>{self.smell_thresholds['high_complexity']})")
                 self.smell_counts['high_complexity'] += 1
             
@@ -164,19 +2268,34 @@ class CodeAnalyzer:
 
             # Track ownership
             if is_method:
-                file_data["ownership"][func_node.parent.name].append(func_node.name)
+                file_data["ownership"][func_info.class_name].append(func_info.name)
             else:
-                file_data["ownership"]["<global>"].append(func_node.name)
+                file_data["ownership"]["<global>"].append(func_info.name)
 
         except Exception as e:
             print(f"Error analyzing function complexity: {e}")
 
-    def analyze_code_smells(self, file_data, tree):
+    def _build_complexity_index(self, file_data):
+        """Group complexity entries by (class, name) so issue tagging is a lookup instead of a scan"""
+        index = defaultdict(list)
+        for comp in file_data["complexity"]:
+            index[(comp.get("class"), comp.get("name"))].append(comp)
+        return index
+
+    def _function_smell_targets(self, complexity_index, name, class_name):
+        """Entries a function smell is tagged on: same-named functions plus same-named methods of its class"""
+        targets = complexity_index.get((None, name), [])
+        if class_name is not None:
+            targets = targets + complexity_index.get((class_name, name), [])
+        return targets
+
+    def analyze_code_smells(self, file_data, structure, complexity_index):
         """Analyze code smells for the file with proper snake_case validation"""
         try:
-            for node in ast.walk(tree):
-                if isinstance(node, ast.ClassDef):
-                    class_length = self._get_node_length(node)
+            for info in structure.definitions:
+                node = info.node
+                if info.is_class:
+                    class_length = info.length
                     if class_length > self.smell_thresholds['long_class']:
                         self.smell_counts['long_class'] += 1
                         smell = {
@@ -185,12 +2304,12 @@ class CodeAnalyzer:
                             "line": node.lineno
                         }
                         file_data["smells"].append(smell)
-                        for comp in file_data["complexity"]:
-                            if comp.get("type") == "class" and comp.get("name") == node.name:
+                        for comp in complexity_index.get((None, node.name), []):
+                            if comp.get("type") == "class":
                                 comp.setdefault("issues", []).append(smell["type"])
 
-                elif isinstance(node, ast.FunctionDef):
-                    method_length = self._get_node_length(node)
+                else:
+                    method_length = info.length
                     if method_length > self.smell_thresholds['long_function']:
                         self.smell_counts['long_function'] += 1
                         smell = {
@@ -199,23 +2318,21 @@ class CodeAnalyzer:
                             "line": node.lineno
                         }
                         file_data["smells"].append(smell)
-                        for comp in file_data["complexity"]:
-                            if comp.get("name") == node.name and (not comp.get("class") or comp.get("class") == getattr(node.parent, "name", None)):
-                                comp.setdefault("issues", []).append(smell["type"])
+                        for comp in self._function_smell_targets(complexity_index, node.name, info.class_name):
+                            comp.setdefault("issues", []).append(smell["type"])
 
-                    if len(node.args.args) > self.smell_thresholds['many_parameters']:
+                    if info.parameter_count > self.smell_thresholds['many_parameters']:
                         self.smell_counts['many_parameters'] += 1
                         smell = {
                             "type": "Many Parameters",
-                            "message": f"{node.name}() ({len(node.args.args)} parameters)",
+                            "message": f"{node.name}() ({info.parameter_count} parameters)",
                             "line": node.lineno
                         }
                         file_data["smells"].append(smell)
-                        for comp in file_data["complexity"]:
-                            if comp.get("name") == node.name and (not comp.get("class") or comp.get("class") == getattr(node.parent, "name", None)):
-                                comp.setdefault("issues", []).append(smell["type"])
+                        for comp in self._function_smell_targets(complexity_index, node.name, info.class_name):
+                            comp.setdefault("issues", []).append(smell["type"])
 
-                    depth = self._get_max_nesting(node)
+                    depth = info.max_nesting
                     if depth > self.smell_thresholds['deep_nesting']:
                         self.smell_counts['deep_nesting'] += 1
                         smell = {
@@ -224,15 +2341,13 @@ class CodeAnalyzer:
                             "line": node.lineno
                         }
                         file_data["smells"].append(smell)
-                        for comp in file_data["complexity"]:
-                            if comp.get("name") == node.name and (not comp.get("class") or comp.get("class") == getattr(node.parent, "name", None)):
-                                comp.setdefault("issues", []).append(smell["type"])
+                        for comp in self._function_smell_targets(complexity_index, node.name, info.class_name):
+                            comp.setdefault("issues", []).append(smell["type"])
 
                     # Improved naming convention check
-                    parent = getattr(node, 'parent', None)
                     name = node.name
-                    
-                    if isinstance(parent, ast.ClassDef):
+
+                    if info.class_name is not None:
                         # Method naming - should be snake_case
                         if not self._is_valid_snake_case(name) and not name.startswith('__'):
                             self.smell_counts['inconsistent_names'] += 1
@@ -242,9 +2357,8 @@ class CodeAnalyzer:
                                 "line": node.lineno
                             }
                             file_data["smells"].append(smell)
-                            for comp in file_data["complexity"]:
-                                if comp.get("name") == name and comp.get("class") == parent.name:
-                                    comp.setdefault("issues", []).append(smell["type"])
+                            for comp in complexity_index.get((info.class_name, name), []):
+                                comp.setdefault("issues", []).append(smell["type"])
                     else:
                         # Function naming - should be snake_case
                         if not self._is_valid_snake_case(name):
@@ -255,13 +2369,35 @@ class CodeAnalyzer:
                                 "line": node.lineno
                             }
                             file_data["smells"].append(smell)
-                            for comp in file_data["complexity"]:
-                                if comp.get("name") == name and not comp.get("class"):
-                                    comp.setdefault("issues", []).append(smell["type"])
+                            for comp in complexity_index.get((None, name), []):
+                                comp.setdefault("issues", []).append(smell["type"])
 
         except Exception as e:
             print(f"Error analyzing code smells: {e}")
 
+    def analyze_performance(self, file_data, source, complexity_index):
+        """Lint the file for performance anti-patterns and add them to its smells"""
+        try:
+            visitor = PerformanceVisitor()
+            visitor.visit(source.tree)
+            for kind, line, function, class_name, detail, cost, loop_depth in visitor.findings:
+                self.smell_counts['performance'] += 1
+                subject = f"{function}()" if function is not None else "<module>"
+                smell = {
+                    "type": kind,
+                    "message": f"{subject} ({detail}, {cost})",
+                    "line": line,
+                    "costClass": cost,
+                    "loopDepth": loop_depth
+                }
+                file_data["smells"].append(smell)
+                if function is not None:
+                    for comp in self._function_smell_targets(complexity_index, function, class_name):
+                        if kind not in comp.setdefault("issues", []):
+                            comp["issues"].append(kind)
+        except Exception as e:
+            print(f"Error analyzing performance anti-patterns for {file_data['path']}: {e}")
+
     def _is_valid_snake_case(self, name):
         """
         Proper snake_case validation that won't flag valid names.
@@ -289,94 +2425,123 @@ class CodeAnalyzer:
             
         return True
 
-    def analyze_dead_code(self, file_data, tree, code, file_path):
-        """Analyze dead code using vulture"""
+    def collect_symbols(self, file_data, structure, source, file_path):
+        """Record the file's vulture definitions and used names for the project-level dead code pass"""
         try:
             vulture_analyzer = Vulture()
-            vulture_analyzer.scan(code, filename=file_path)
-            dead_code = vulture_analyzer.get_unused_code()
-
-            seen = set()  # Track unique dead code entries
-            if dead_code:
-                for item in dead_code[:10]:  # Limit to 10 dead code items per file
-                    owner = '<global>'
-                    for node in ast.walk(tree):
-                        if isinstance(node, ast.FunctionDef) and node.name == item.name:
-                            parent = getattr(node, 'parent', None)
-                            if isinstance(parent, ast.ClassDef):
-                                owner = parent.name
-                    dead_code_str = f"{owner}.{item.name} ({item.typ})" if owner != '<global>' else f"{item.name} ({item.typ})"
+            self._vulture_scan(vulture_analyzer, source, file_path)
+
+            # Owning class per function name; the last method in walk order wins
+            method_owners = {}
+            for info in sorted(structure.functions, key=lambda info: info.walk_order):
+                if info.class_name is not None:
+                    method_owners[info.name] = info.class_name
+
+            # Same order vulture reports unused code in: by category and name, then by line
+            definitions = []
+            for defined in (vulture_analyzer.defined_attrs, vulture_analyzer.defined_classes,
+                            vulture_analyzer.defined_funcs, vulture_analyzer.defined_imports,
+                            vulture_analyzer.defined_methods, vulture_analyzer.defined_props,
+                            vulture_analyzer.defined_vars):
+                definitions.extend(sorted(set(defined), key=lambda item: item.name.lower()))
+            definitions.extend(vulture_analyzer.unreachable_code)
+            definitions.sort(key=lambda item: item.first_lineno)
+
+            file_data["symbols"] = {
+                "definitions": [[item.name, item.typ, item.first_lineno] for item in definitions],
+                "uses": sorted(vulture_analyzer.used_names),
+                "methodOwners": method_owners
+            }
+        except Exception as e:
+            print(f"Error collecting symbols for {file_path}: {e}")
+
+    def collect_clone_units(self, file_data, source, file_path):
+        """Add the file's clone fingerprints to its symbols; they are resolved into groups project-wide"""
+        if "symbols" not in file_data:
+            return
+        try:
+            file_data["symbols"]["clones"] = _clone_fingerprints(source.tree, self.smell_thresholds['duplicate_code'])
+        except Exception as e:
+            print(f"Error fingerprinting clones for {file_path}: {e}")
+
+    def _vulture_scan(self, vulture_analyzer, source, file_path):
+        """Vulture.scan minus its own ast.parse: visit the tree the other stages already use"""
+        if not hasattr(vulture_analyzer, "reachability"):
+            vulture_analyzer.scan(source.code, filename=file_path)  # older vulture without the split-up scan
+            return
+        vulture_analyzer.code = source.code.splitlines()
+        vulture_analyzer.noqa_lines = noqa.parse_noqa(vulture_analyzer.code)
+        vulture_analyzer.filename = Path(file_path)
+        # vulture only sees files whose type comments parse; others contribute no symbols, as with scan()
+        if source.type_comments:
+            try:
+                vulture_analyzer.visit(source.tree)
+            except SyntaxError:
+                pass
+        vulture_analyzer.reachability.reset()
+
+    def resolve_dead_code(self, file_data, used_names):
+        """Fill in a file's dead code from its definitions and the project's used names"""
+        symbols = file_data.pop("symbols", None)
+        if symbols is None:
+            return
+        timer = PhaseTimer(file_data["timings"]) if "timings" in file_data else NULL_TIMER
+        try:
+            with timer.phase("deadCode"):
+                dead_code = [
+                    (name, typ) for name, typ, _ in symbols["definitions"]
+                    if typ == "unreachable_code" or name not in used_names
+                ]
+                complexity_index = self._build_complexity_index(file_data)
+                method_owners = symbols["methodOwners"]
+
+                seen = set()  # Track unique dead code entries
+                for name, typ in dead_code[:10]:  # Limit to 10 dead code items per file
+                    owner = method_owners.get(name, '<global>')
+                    dead_code_str = f"{owner}.{name} ({typ})" if owner != '<global>' else f"{name} ({typ})"
                     if dead_code_str in seen:
                         continue  # Skip duplicates
                     seen.add(dead_code_str)
                     file_data["deadCode"].append(dead_code_str)
                     self.smell_counts['dead_code'] += 1
 
-                    for comp in file_data["complexity"]:
-                        if owner != '<global>':
-                            if comp.get("name") == item.name and comp.get("class") == owner:
-                                if "Dead Code" not in comp.setdefault("issues", []):
-                                    comp["issues"].append("Dead Code")
-                        else:
-                            if comp.get("name") == item.name and not comp.get("class"):
-                                if "Dead Code" not in comp.setdefault("issues", []):
-                                    comp["issues"].append("Dead Code")
+                    class_name = owner if owner != '<global>' else None
+                    for comp in complexity_index.get((class_name, name), []):
+                        if "Dead Code" not in comp.setdefault("issues", []):
+                            comp["issues"].append("Dead Code")
 
         except Exception as e:
-            print(f"Error analyzing dead code: {e}")
-
-    def calculate_project_metrics(self):
-        """Calculate all project-level metrics with improved robustness"""
-        total_files = len(self.analysis_results["files"])
-        total_lines = sum(f["fileStats"].get("loc", 0) for f in self.analysis_results["files"])
-        
-        # Calculate weighted average maintainability index
-        mi_values = []
-        for f in self.analysis_results["files"]:
-            if "maintainabilityIndex" in f:
-                weight = f["fileStats"].get("loc", 1)  # Weight by file size
-                mi_values.append((f["maintainabilityIndex"], weight))
-        
-        if mi_values:
-            total_weight = sum(w for _, w in mi_values)
-            avg_mi = sum(mi * w for mi, w in mi_values) / total_weight if total_weight > 0 else 0
-        else:
-            avg_mi = 0
+            print(f"Error analyzing dead code for {file_data['path']}: {e}")
 
-        # Count classes and functions with more robust detection
-        total_classes = 0
-        total_functions = 0
-        class_method_counts = []
-        
-        for file_data in self.analysis_results["files"]:
-            for class_name, methods in file_data["ownership"].items():
-                if class_name != "<global>":
-                    total_classes += 1
-                    class_method_counts.append(len(methods))
-                total_functions += len(methods)
+    def build_summary(self, totals, clone_groups=()):
+        """Build the project summary from running totals and the project's clone groups"""
+        duplicated_lines = sum(group["lines"] * (len(group["locations"]) - 1) for group in clone_groups)
+        duplicated_ratio = duplicated_lines / totals.total_lines if totals.total_lines > 0 else 0
 
         # Enhanced reusability score calculation
         reusability_score = self.calculate_reusability_score(
-            total_classes,
-            total_functions,
-            class_method_counts
+            totals.total_classes,
+            totals.total_functions,
+            totals.class_methods,
+            duplicated_ratio
         )
 
         # More sophisticated carbon footprint estimation
         carbon_footprint = self.estimate_carbon_footprint(
-            total_lines,
-            total_classes,
-            total_functions,
+            totals.total_lines,
+            totals.total_classes,
+            totals.total_functions,
             self.smell_counts
         )
 
         # Update summary with enhanced metrics
-        self.analysis_results["summary"] = {
-            "totalFiles": total_files,
-            "totalLines": total_lines,
-            "totalClasses": total_classes,
-            "totalFunctions": total_functions,
-            "maintainabilityIndex": round(avg_mi, 2),
+        return {
+            "tier": self.tier,
+            "totalFiles": totals.total_files,
+            "totalLines": totals.total_lines,
+            "totalClasses": totals.total_classes,
+            "totalFunctions": totals.total_functions,
+            "maintainabilityIndex": round(totals.average_mi, 2) if self.tier != "quick" else None,
             "reusabilityScore": round(reusability_score, 2),
             "carbonFootprint": round(carbon_footprint, 2),
             "smells": [
@@ -387,21 +2552,31 @@ class CodeAnalyzer:
                 {"type": "Many Methods", "count": self.smell_counts["many_methods"]},
                 {"type": "High Complexity", "count": self.smell_counts["high_complexity"]},
                 {"type": "Inconsistent Names", "count": self.smell_counts["inconsistent_names"]},
-                {"type": "Dead Code", "count": self.smell_counts["dead_code"]}
-            ]
+                {"type": "Dead Code", "count": self.smell_counts["dead_code"]},
+                {"type": "Performance Issues", "count": self.smell_counts["performance"]}
+            ],
+            # Files dropped by discovery as generated, so a wrongly skipped file can be spotted
+            "skippedGenerated": {
+                "count": len(self.skipped_generated),
+                "paths": self.skipped_generated[:self.SKIPPED_PATHS_LISTED]
+            },
+            # The groups go to the report's top-level "clones" (clones.json in a chunked report)
+            "duplicatedLines": duplicated_lines,
+            "cloneGroups": len(clone_groups)
         }
 
-    def calculate_reusability_score(self, total_classes, total_functions, class_method_counts):
+    def calculate_reusability_score(self, total_classes, total_functions, class_methods, duplicated_ratio=0):
         """
         Calculate a more robust reusability score based on multiple factors:
         1. Average methods per class (lower is better)
         2. Percentage of pure functions (functions not in classes)
+        3. Share of lines that are copies of other code (copy-paste instead of reuse)
         """
         if total_classes == 0:
             return 0  # No classes means no OOP reusability
             
-        avg_methods = sum(class_method_counts) / total_classes if class_method_counts else 0
-        pure_function_ratio = (total_functions - sum(class_method_counts)) / total_functions if total_functions > 0 else 0
+        avg_methods = class_methods / total_classes
+        pure_function_ratio = (total_functions - class_methods) / total_functions if total_functions > 0 else 0
         
         # Score components (0-100 scale)
         method_score = max(0, 100 - (avg_methods * 5))  # Penalize many methods per class
@@ -409,6 +2584,9 @@ class CodeAnalyzer:
         
         # Combine scores with weights
         reusability_score = (method_score * 0.7) + (pure_function_score * 0.3)
+
+        # Duplicated code scales the score down proportionally
+        reusability_score *= 1 - min(1, duplicated_ratio)
         
         return min(100, max(0, reusability_score))
 
@@ -447,37 +2625,640 @@ class CodeAnalyzer:
         
         return footprint
 
-    def save_results_to_json(self, directory_path):
-        output_path = os.path.join(directory_path, "complexity_report.json")
+
+class GitDiffAnalysis:
+    """
+    Analyze only the .py files that differ between two git revisions (or
+    between a revision and the working tree) and report how their
+    complexity, maintainability and smells moved. Work is proportional to
+    the size of the diff: the changed paths come from git plumbing and both
+    sides are read straight from the object database.
+    """
+
+    def __init__(self, analyzer, directory_path, base, head=None):
+        # Symbols and clone fingerprints only serve project-wide phases, so the diff stops at the standard tier
+        if analyzer.tier == "full":
+            analyzer.tier = "standard"
+        self.analyzer = analyzer
+        self.directory_path = directory_path
+        self.base = base
+        self.head = head  # None compares against the working tree
+
+    def _git(self, *args, stdin=None):
+        result = subprocess.run(["git", "-C", self.directory_path, *args],
+                                input=stdin, capture_output=True, check=True)
+        return result.stdout
+
+    def changed_files(self):
+        """Return (status, path) for changed .py and .ipynb files, paths relative to the analyzed directory"""
+        options = ["-r", "-z", "--no-renames", "--name-status", "--relative"]
+        if self.head is not None:
+            output = self._git("diff-tree", *options, self.base, self.head, "--", ".")
+        else:
+            output = self._git("diff-index", *options, self.base, "--", ".")
+        fields = output.decode("utf-8").split("\0")
+        discovery = FileDiscovery(self.directory_path, **self.analyzer.discovery_options)
+        changes = {}
+        for status, path in zip(fields[0::2], fields[1::2]):
+            if path.endswith(SOURCE_SUFFIXES) and discovery.accepts(path):
+                changes[path] = status[0]
+
+        # New files that are not tracked yet are additions too when comparing with the working tree
+        if self.head is None:
+            untracked = self._git("ls-files", "-z", "--others", "--exclude-standard", "--", ".")
+            for path in untracked.decode("utf-8").split("\0"):
+                if path.endswith(SOURCE_SUFFIXES) and discovery.accepts(path):
+                    changes.setdefault(path, "A")
+
+        return sorted(((status, path) for path, status in changes.items()),
+                      key=lambda change: _walk_order_key(change[1]))
+
+    def read_sources(self, revision, paths):
+        """Read each path at `revision` with a single `git cat-file --batch` call"""
+        if not paths:
+            return {}
+        requests = "".join(f"{revision}:./{path}\n" for path in paths).encode("utf-8")
+        output = self._git("cat-file", "--batch", stdin=requests)
+        sources = {}
+        offset = 0
+        for path in paths:
+            header_end = output.index(b"\n", offset)
+            header = output[offset:header_end].split()
+            offset = header_end + 1
+            if len(header) != 3:
+                continue  # "<object> missing"
+            size = int(header[2])
+            try:
+                sources[path] = _decode_source(output[offset:offset + size])
+            except UnicodeDecodeError as e:
+                print(f"Error reading file {path} at {revision}: {e}")
+            offset += size + 1
+        return sources
+
+    def read_working_tree(self, paths):
+        sources = {}
+        prefetcher = FilePrefetcher(self.analyzer.reads_in_flight)
+        for _, path, data, _ in prefetcher.read((os.path.join(self.directory_path, path), path) for path in paths):
+            try:
+                if isinstance(data, Exception):
+                    raise data
+                sources[path] = _decode_source(data)
+            except Exception as e:
+                print(f"Error reading file {path}: {e}")
+        return sources
+
+    def analyze_sources(self, sources):
+        records = {}
+        for path, code in sources.items():
+            file_data, _ = self.analyzer.analyze_file_isolated(
+                os.path.join(self.directory_path, path), path, code)
+            if file_data is not None:
+                records[path] = file_data
+        return records
+
+    def run(self):
+        changes = self.changed_files()
+        before_paths = [path for status, path in changes if status != "A"]
+        after_paths = [path for status, path in changes if status != "D"]
+
+        before = self.analyze_sources(self.read_sources(self.base, before_paths))
+        if self.head is not None:
+            after_sources = self.read_sources(self.head, after_paths)
+        else:
+            after_sources = self.read_working_tree(after_paths)
+        after = self.analyze_sources(after_sources)
+
+        files = []
+        for status, path in changes:
+            files.append(self.compare_file(path, status, before.get(path), after.get(path)))
+        return {
+            "projectName": os.path.basename(os.path.abspath(self.directory_path)),
+            "base": self.base,
+            "head": self.head or "WORKTREE",
+            "files": files,
+            "summary": self.summarize(files)
+        }
+
+    def compare_file(self, path, status, before, after):
+        """Per-file delta: MI and LOC change, per-function complexity changes, new and resolved smells"""
+        statuses = {"A": "added", "D": "deleted"}
+        before_mi = before.get("maintainabilityIndex") if before else None
+        after_mi = after.get("maintainabilityIndex") if after else None
+        before_loc = before["fileStats"].get("loc", 0) if before else 0
+        after_loc = after["fileStats"].get("loc", 0) if after else 0
+        return {
+            "path": path,
+            "status": statuses.get(status, "modified"),
+            "maintainabilityIndex": {
+                "before": before_mi,
+                "after": after_mi,
+                "delta": round(after_mi - before_mi, 2) if before_mi is not None and after_mi is not None else None
+            },
+            "loc": {"before": before_loc, "after": after_loc, "delta": after_loc - before_loc},
+            "functions": self.compare_functions(before["complexity"] if before else [],
+                                                after["complexity"] if after else []),
+            "newSmells": self.subtract_smells(after["smells"] if after else [], before["smells"] if before else []),
+            "resolvedSmells": self.subtract_smells(before["smells"] if before else [], after["smells"] if after else [])
+        }
+
+    def compare_functions(self, before, after):
+        """Pair functions by (class, name) in file order and keep the ones whose complexity moved"""
+        previous = defaultdict(list)
+        for comp in before:
+            previous[(comp["class"], comp["name"])].append(comp)
+        for entries in previous.values():
+            entries.reverse()
+
+        changes = []
+        for comp in after:
+            entries = previous.get((comp["class"], comp["name"]))
+            old = entries.pop() if entries else None
+            old_value = old["value"] if old else 0
+            if old is None or old_value != comp["value"]:
+                changes.append({
+                    "name": comp["name"],
+                    "class": comp["class"],
+                    "type": comp["type"],
+                    "status": "added" if old is None else "changed",
+                    "before": old["value"] if old else None,
+                    "after": comp["value"],
+                    "delta": comp["value"] - old_value
+                })
+        for entries in previous.values():
+            for old in reversed(entries):
+                changes.append({
+                    "name": old["name"],
+                    "class": old["class"],
+                    "type": old["type"],
+                    "status": "removed",
+                    "before": old["value"],
+                    "after": None,
+                    "delta": -old["value"]
+                })
+        return changes
+
+    def _smell_key(self, smell):
+        return smell["type"], _smell_subject(smell["message"])
+
+    def subtract_smells(self, smells, others):
+        """Smells in `smells` with no counterpart in `others`"""
+        remaining = defaultdict(int)
+        for smell in others:
+            remaining[self._smell_key(smell)] += 1
+        result = []
+        for smell in smells:
+            key = self._smell_key(smell)
+            if remaining[key] > 0:
+                remaining[key] -= 1
+            else:
+                result.append(smell)
+        return result
+
+    def summarize(self, files):
+        new_smells = defaultdict(int)
+        resolved_smells = defaultdict(int)
+        for file_delta in files:
+            for smell in file_delta["newSmells"]:
+                new_smells[smell["type"]] += 1
+            for smell in file_delta["resolvedSmells"]:
+                resolved_smells[smell["type"]] += 1
+        functions = [func for file_delta in files for func in file_delta["functions"]]
+        return {
+            "filesAdded": sum(1 for f in files if f["status"] == "added"),
+            "filesModified": sum(1 for f in files if f["status"] == "modified"),
+            "filesDeleted": sum(1 for f in files if f["status"] == "deleted"),
+            "locDelta": sum(f["loc"]["delta"] for f in files),
+            "complexityIncreased": sum(1 for func in functions if func["status"] == "changed" and func["delta"] > 0),
+            "complexityDecreased": sum(1 for func in functions if func["status"] == "changed" and func["delta"] < 0),
+            "newSmells": dict(new_smells),
+            "resolvedSmells": dict(resolved_smells)
+        }
+
+    def save(self, report):
+        output_path = os.path.join(self.directory_path, "complexity_delta.json")
         with open(output_path, 'w') as f:
-            json.dump(self.analysis_results, f, indent=2)
-        print(f"\nAnalysis results saved to: {output_path}")
+            json.dump(report, f, indent=2)
+        print(f"Delta report saved to {output_path}")
+
+
+def _walk_order_key(relative_path):
+    """Sort key matching discover_files: a directory's files come before its subdirectories"""
+    parts = os.path.normpath(relative_path).split(os.sep)
+    return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+
+class AnalysisDaemon:
+    """
+    Long-lived analyzer for editor integrations. Keeps every file's record
+    in memory, polls the directory for changes and speaks line-delimited
+    JSON-RPC 2.0 over stdin/stdout. Only touched files are re-analyzed, and
+    clients receive per-file deltas together with the updated summary.
+    """
+
+    # Below this many changed files a worker pool costs more than it saves
+    POOL_THRESHOLD = 16
+
+    def __init__(self, analyzer, directory_path, jobs=None, cache_file=None, poll_interval=1.0):
+        self.analyzer = analyzer
+        self.directory_path = directory_path
+        self.jobs = jobs or os.cpu_count() or 1
+        self.cache_file = cache_file
+        self.poll_interval = poll_interval
+        self.raw_records = {}      # path -> serialized record before dead code resolution
+        self.symbols = {}          # path -> definitions and used names
+        self.file_smells = {}      # path -> smell counts produced by analyze_file
+        self.records = {}          # path -> finalized report record
+        self.order = []            # sorted (walk order key, path) pairs
+        self.name_uses = Counter() # name -> number of files using it
+        self.definers = defaultdict(set)  # name -> files defining it
+        self.clone_index = CloneIndex()
+        self.rollups = DirectoryRollups()
+        self.totals = ProjectTotals()      # over the finalized records, kept up to date per file
+        self.smell_counts = Counter()
+        self.snapshot = {}
+        self.lock = threading.RLock()
+        self.output_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.output = sys.stdout
+
+    def load(self):
+        """Analyze the whole directory once to warm up the in-memory state"""
+        self.analyzer.analysis_results["projectName"] = os.path.basename(os.path.abspath(self.directory_path))
+        file_list = self.analyzer.discover_files(self.directory_path)
+        self.snapshot = self._stat_files(relative_path for _, relative_path in file_list)
+
+        cache = AnalysisCache(self.cache_file, self.analyzer.smell_thresholds,
+                              self.analyzer.tier) if self.cache_file else None
+        records = self.analyzer.collect_records(file_list, self.jobs, cache)
+        for (_, relative_path), (file_data, smell_counts) in zip(file_list, records):
+            if file_data is not None:
+                self._set_raw(relative_path, file_data, smell_counts)
+        if cache is not None:
+            cache.save()
+
+        for relative_path in self.raw_records:
+            self._finalize(relative_path)
+
+    def _stat_files(self, relative_paths):
+        stats = {}
+        for relative_path in relative_paths:
+            try:
+                stat = os.stat(os.path.join(self.directory_path, relative_path))
+            except OSError:
+                continue
+            stats[relative_path] = (stat.st_mtime_ns, stat.st_size)
+        return stats
+
+    def _set_raw(self, path, file_data, smell_counts):
+        """Store a freshly analyzed record; returns names whose used/unused state flipped"""
+        toggled = self._remove_raw(path)
+        symbols = file_data.get("symbols", {"definitions": [], "uses": []})
+        for name in symbols["uses"]:
+            if self.name_uses[name] == 0:
+                toggled ^= {name}
+            self.name_uses[name] += 1
+        for name, _, _ in symbols["definitions"]:
+            self.definers[name].add(path)
+
+        self.raw_records[path] = json.dumps(file_data)
+        self.symbols[path] = symbols
+        self.clone_index.add(path, symbols.get("clones", []))
+        self.file_smells[path] = smell_counts
+        self.smell_counts.update(smell_counts)
+        bisect.insort(self.order, (_walk_order_key(path), path))
+        return toggled
+
+    def _remove_raw(self, path):
+        """Forget a file's record; returns names whose used/unused state flipped"""
+        toggled = set()
+        symbols = self.symbols.pop(path, None)
+        if symbols is None:
+            return toggled
+        for name in symbols["uses"]:
+            self.name_uses[name] -= 1
+            if self.name_uses[name] <= 0:
+                del self.name_uses[name]
+                toggled.add(name)
+        for name, _, _ in symbols["definitions"]:
+            self.definers[name].discard(path)
+            if not self.definers[name]:
+                del self.definers[name]
+
+        self.rollups.remove(path)
+        del self.raw_records[path]
+        self.smell_counts.subtract(self.file_smells.pop(path))
+        self._forget_record(path)
+        entry = (_walk_order_key(path), path)
+        index = bisect.bisect_left(self.order, entry)
+        if index < len(self.order) and self.order[index] == entry:
+            del self.order[index]
+        return toggled
+
+    def _forget_record(self, path):
+        file_data = self.records.pop(path, None)
+        if file_data is not None:
+            self.totals.remove(file_data)
+            self.smell_counts['dead_code'] -= len(file_data["deadCode"])
+
+    def _finalize(self, path):
+        file_data = json.loads(self.raw_records[path])
+        self.analyzer.resolve_dead_code(file_data, self.name_uses)
+        self._forget_record(path)
+        self.records[path] = file_data
+        self.totals.add(file_data)
+        self.smell_counts['dead_code'] += len(file_data["deadCode"])
+        self.rollups.set(path, DirectoryRollups.contribution(file_data, self.file_smells[path]))
+
+    def update(self, changed_paths, removed_paths):
+        """Re-analyze changed files, drop removed ones and return the resulting delta"""
+        with self.lock:
+            jobs = self.jobs if len(changed_paths) >= self.POOL_THRESHOLD else 1
+            file_list = [(os.path.join(self.directory_path, path), path) for path in changed_paths]
+            toggled = set()
+            changed = set()
+            removed = set(removed_paths)
+            for path, (file_data, smell_counts) in zip(changed_paths, self.analyzer.analyze_files(file_list, jobs)):
+                if file_data is None:
+                    removed.add(path)
+                    continue
+                toggled ^= self._set_raw(path, file_data, smell_counts)
+                changed.add(path)
+            for path in removed:
+                toggled ^= self._remove_raw(path)
+                self.clone_index.remove(path)
+
+            # Files defining a name that became used or unused need their dead code re-resolved
+            for name in toggled:
+                changed.update(self.definers.get(name, ()))
+            changed &= self.raw_records.keys()
+            for path in changed:
+                self._finalize(path)
+
+            return {
+                "changed": [self.records[path] for path in sorted(changed, key=_walk_order_key)],
+                "removed": sorted(removed - changed, key=_walk_order_key),
+                "summary": self.summary(),
+                "directories": self.rollups.changed(changed | removed, self.analyzer)
+            }
+
+    def summary(self):
+        """Built from the running totals and the cached clone groups, so it costs the same for any project size"""
+        with self.lock:
+            self.analyzer.smell_counts = defaultdict(int, self.smell_counts)
+            return self.analyzer.build_summary(self.totals, self.clone_index.groups())
+
+    def report(self):
+        with self.lock:
+            return {
+                "projectName": self.analyzer.analysis_results["projectName"],
+                "files": [self.records[path] for _, path in self.order],
+                "summary": self.summary(),
+                "clones": self.clone_index.groups(),
+                "directories": self.rollups.summary(self.analyzer)
+            }
 
-    def _get_node_length(self, node):
-        if hasattr(node, 'end_lineno'):
-            return node.end_lineno - node.lineno + 1
-        last_node = node.body[-1] if node.body else node
-        return (last_node.lineno - node.lineno + 1) if hasattr(last_node, 'lineno') else 0
+    def clones(self):
+        with self.lock:
+            return self.clone_index.groups()
 
-    def _get_max_nesting(self, node):
-        max_depth = 0
-        for child in ast.walk(node):
-            if isinstance(child, (ast.If, ast.For, ast.While, ast.With, ast.Try)):
-                depth = sum(1 for _ in self._get_parents(child) if isinstance(_, (ast.If, ast.For, ast.While, ast.With, ast.Try)))
-                max_depth = max(max_depth, depth)
-        return max_depth
+    def poll(self):
+        """Compare file stats with the last snapshot and re-analyze whatever changed"""
+        file_list = self.analyzer.discover_files(self.directory_path)
+        current = self._stat_files(relative_path for _, relative_path in file_list)
+        with self.lock:
+            changed = [path for path, stat in current.items() if self.snapshot.get(path) != stat]
+            removed = [path for path in self.snapshot if path not in current]
+            self.snapshot = current
+        if not changed and not removed:
+            return None
+        return self.update(changed, removed)
 
-    def _get_parents(self, node):
-        while hasattr(node, 'parent'):
-            node = node.parent
-            yield node
+    def refresh(self, paths):
+        """Re-analyze the given files right away, e.g. after the editor saved them"""
+        changed = []
+        removed = []
+        root = os.path.abspath(self.directory_path)
+        # The same filters as the walk behind poll(), so a refresh never lists a file the next poll drops
+        discovery = FileDiscovery(self.directory_path, **self.analyzer.discovery_options)
+        with self.lock:
+            for path in paths:
+                relative_path = os.path.relpath(os.path.abspath(path), root) if os.path.isabs(path) else path
+                if not relative_path.endswith(SOURCE_SUFFIXES) or relative_path.startswith('..'):
+                    continue
+                stats = self._stat_files([relative_path])
+                if relative_path in stats and discovery.accepts_file(relative_path):
+                    self.snapshot[relative_path] = stats[relative_path]
+                    changed.append(relative_path)
+                elif relative_path in self.snapshot or relative_path in self.raw_records:
+                    self.snapshot.pop(relative_path, None)
+                    removed.append(relative_path)
+            return self.update(changed, removed)
+
+    def watch(self):
+        while not self.stop_event.wait(self.poll_interval):
+            try:
+                delta = self.poll()
+            except Exception as e:
+                print(f"Error watching {self.directory_path}: {e}")
+                continue
+            if delta is not None:
+                self.send({"jsonrpc": "2.0", "method": "reportChanged", "params": delta})
+
+    def send(self, message):
+        with self.output_lock:
+            self.output.write(json.dumps(message) + "\n")
+            self.output.flush()
+
+    def handle(self, line):
+        """Dispatch one JSON-RPC message; returns False once the client asked to shut down"""
+        try:
+            message = json.loads(line)
+        except ValueError:
+            self.send({"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}})
+            return True
+        if not isinstance(message, dict) or not isinstance(message.get("method"), str):
+            self.send({"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid Request"}})
+            return True
+
+        request_id = message.get("id")
+        method = message["method"]
+        params = message.get("params") or {}
+        handlers = {
+            "getReport": lambda: self.report(),
+            "getSummary": lambda: self.summary(),
+            "getClones": lambda: self.clones(),
+            "getFile": lambda: self.records.get(params["path"]),
+            "refresh": lambda: self.refresh(params["paths"]),
+            "shutdown": lambda: None
+        }
+
+        response = {"jsonrpc": "2.0", "id": request_id}
+        if method not in handlers:
+            response["error"] = {"code": -32601, "message": f"Method not found: {method}"}
+        else:
+            try:
+                response["result"] = handlers[method]()
+            except (KeyError, TypeError) as e:
+                response["error"] = {"code": -32602, "message": f"Invalid params: {e}"}
+            except Exception as e:
+                response["error"] = {"code": -32603, "message": str(e)}
+        if request_id is not None:
+            self.send(response)
+        return method != "shutdown"
+
+    def serve(self):
+        # Analyzer progress and errors go to stderr so stdout carries only protocol messages
+        sys.stdout = sys.stderr
+        self.load()
+        self.send({"jsonrpc": "2.0", "method": "ready",
+                   "params": {"files": len(self.records), "summary": self.summary()}})
+
+        watcher = threading.Thread(target=self.watch, daemon=True)
+        watcher.start()
+        try:
+            for line in sys.stdin:
+                if line.strip() and not self.handle(line):
+                    break
+        finally:
+            self.stop_event.set()
+
+
+# Per-process analyzer used by the worker pool
+_worker_analyzer = None
+
+
+def _init_worker(smell_thresholds, collect_timings=False, tier="full"):
+    global _worker_analyzer
+    _worker_analyzer = CodeAnalyzer()
+    _worker_analyzer.smell_thresholds = smell_thresholds
+    _worker_analyzer.collect_timings = collect_timings
+    _worker_analyzer.tier = tier
+
+
+def _analyze_batch_worker(batch):
+    """Analyze a batch of prefetched files in a worker and return their records with the smells they added"""
+    return [_worker_analyzer.analyze_source(*task) for task in batch]
+
+
+def _shard_of(relative_path, count):
+    """Stable 1-based shard of a file: the same path lands on the same shard on every machine"""
+    digest = hashlib.sha1(relative_path.replace(os.sep, '/').encode('utf-8')).hexdigest()
+    return int(digest[:8], 16) % count + 1
+
+
+def _parse_shard(text):
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard {text!r}, expected i/N such as 2/4")
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"invalid shard {text!r}, i must be between 1 and N")
+    return index, count
+
+
+def _parse_size(text):
+    """Parse a byte count such as 500000, 512K, 256M or 2G"""
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper().rstrip("B")
+    try:
+        if text and text[-1] in units:
+            return int(float(text[:-1]) * units[text[-1]])
+        return int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {text!r}")
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        directory = sys.argv[1]
-    else:
+    parser = argparse.ArgumentParser(description="Python complexity checker")
+    parser.add_argument("directory", nargs="?", help="Directory to analyze")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="Number of worker processes (default: number of CPU cores)")
+    parser.add_argument("--tier", choices=ANALYSIS_TIERS, default="full",
+                        help="quick: LOC and complexity; standard: also MI and smells; "
+                             "full (default): also dead code and clone detection")
+    parser.add_argument("--reads-in-flight", type=int, default=DEFAULT_READS_IN_FLIGHT, metavar="N",
+                        help="Number of file reads kept in flight ahead of the analysis "
+                             f"(default: {DEFAULT_READS_IN_FLIGHT}; raise it on network filesystems)")
+    parser.add_argument("--cache-file", default=None,
+                        help="Incremental cache location (default: <directory>/.complexity_cache.db)")
+    parser.add_argument("--no-cache", action="store_true", help="Re-analyze every file without using the cache")
+    parser.add_argument("--stream", action="store_true",
+                        help="Write file records to the report as they are finalized instead of holding them in memory")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Stay running, watch the directory and serve JSON-RPC requests over stdin/stdout")
+    parser.add_argument("--poll-interval", type=float, default=1.0,
+                        help="Seconds between directory scans in daemon mode")
+    diff_scope = parser.add_mutually_exclusive_group()
+    diff_scope.add_argument("--changed-since", metavar="REV", default=None,
+                        help="Only analyze .py files changed between REV and the working tree; writes complexity_delta.json")
+    diff_scope.add_argument("--revisions", nargs=2, metavar=("BASE", "HEAD"), default=None,
+                        help="Only analyze .py files changed between two revisions; writes complexity_delta.json")
+    parser.add_argument("--max-memory", type=_parse_size, default=None, metavar="SIZE",
+                        help="Spill finished records to a temporary file once they take more than SIZE (e.g. 256M)")
+    parser.add_argument("--history", nargs="?", const="", default=None, metavar="DB",
+                        help="Record this run in a SQLite history database (default: <directory>/.complexity_history.db); "
+                             "query it with complexity_history.py")
+    parser.add_argument("--chunked", action="store_true",
+                        help="Also write a paged report to <directory>/complexity_report/ for on-demand loading")
+    parser.add_argument("--shard", type=_parse_shard, default=None, metavar="i/N",
+                        help="Analyze only shard i of N (stable hash of the file path) and write a partial report")
+    parser.add_argument("--merge", nargs="+", default=None, metavar="PARTIAL",
+                        help="Merge the partial reports of all shards into <directory>/complexity_report.json")
+    parser.add_argument("--timings", action="store_true",
+                        help="Record wall and CPU time per analysis phase for every file and summarize them in the report")
+    parser.add_argument("--include", action="append", metavar="GLOB", default=[],
+                        help="Only analyze files whose path or name matches GLOB (repeatable)")
+    parser.add_argument("--exclude", action="append", metavar="GLOB", default=[],
+                        help="Skip files and prune directories whose path or name matches GLOB (repeatable)")
+    parser.add_argument("--max-file-size", type=int, default=1_000_000, metavar="BYTES",
+                        help="Skip files larger than BYTES (default: 1000000, 0 disables the limit)")
+    parser.add_argument("--no-gitignore", action="store_true", help="Do not apply .gitignore rules during discovery")
+    parser.add_argument("--include-generated", action="store_true",
+                        help="Analyze files marked as generated (e.g. *_pb2.py, '# @generated' headers)")
+    args = parser.parse_args()
+
+    directory = args.directory
+    if not directory and args.merge:
+        directory = "."
+    if not directory:
+        if args.daemon:
+            parser.error("a directory is required in daemon mode")
         directory = input("Enter directory path to analyze: ").strip()
 
+    cache_file = None
+    if not args.no_cache:
+        cache_file = args.cache_file or os.path.join(directory, ".complexity_cache.db")
+
     analyzer = CodeAnalyzer()
-    analyzer.analyze_directory(directory)
\ No newline at end of file
+    analyzer.discovery_options = {
+        "include": args.include,
+        "exclude": args.exclude,
+        "max_file_size": args.max_file_size,
+        "use_gitignore": not args.no_gitignore,
+        "skip_generated": not args.include_generated
+    }
+    analyzer.collect_timings = args.timings
+    analyzer.max_memory = args.max_memory
+    analyzer.shard = args.shard
+    analyzer.chunked = args.chunked
+    analyzer.reads_in_flight = args.reads_in_flight
+    analyzer.tier = args.tier
+    if args.history is not None:
+        analyzer.history_file = args.history or os.path.join(directory, ".complexity_history.db")
+    if args.merge:
+        try:
+            analyzer.merge_partial_reports(args.merge, directory, stream=args.stream)
+        except (OSError, ValueError, KeyError) as e:
+            sys.exit(f"Cannot merge partial reports: {e}")
+    elif args.changed_since or args.revisions:
+        base, head = args.revisions or (args.changed_since, None)
+        diff_analysis = GitDiffAnalysis(analyzer, directory, base, head)
+        try:
+            diff_analysis.save(diff_analysis.run())
+        except subprocess.CalledProcessError as e:
+            sys.exit(f"git failed: {e.stderr.decode('utf-8', errors='replace').strip()}")
+    elif args.daemon:
+        AnalysisDaemon(analyzer, directory, jobs=args.jobs, cache_file=cache_file,
+                       poll_interval=args.poll_interval).serve()
+    else:
+        analyzer.analyze_directory(directory, jobs=args.jobs, cache_file=cache_file, stream=args.stream)
\ No newline at end of file
@@ -0,0 +1,71 @@
+import sys
+import json
+import argparse
+
+from complexity_checker import HistoryDatabase
+
+
+def print_table(rows, columns):
+    """Print rows as aligned columns, or a note when there are none"""
+    if not rows:
+        print("No results.")
+        return
+    widths = [max(len(column), *(len(str(row[column])) for row in rows)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row in rows:
+        print("  ".join(str(row[column]).ljust(width) for column, width in zip(columns, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the complexity history recorded with complexity_checker.py --history")
+    parser.add_argument("database", help="History database, e.g. <project>/.complexity_history.db")
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("--json", action="store_true", help="Print results as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    runs = commands.add_parser("runs", parents=[output], help="List recorded runs, newest first")
+    runs.add_argument("--limit", type=int, default=20)
+
+    worst = commands.add_parser("worst", parents=[output], help="Top-N most complex functions of a run")
+    worst.add_argument("--run", type=int, default=None, help="Run id (default: latest)")
+    worst.add_argument("--limit", "-n", type=int, default=10)
+
+    trend = commands.add_parser("trend", parents=[output], help="LOC, MI, complexity and smells of one file across runs")
+    trend.add_argument("path", help="File path relative to the analyzed directory")
+    trend.add_argument("--limit", type=int, default=50)
+
+    new_smells = commands.add_parser("new-smells", parents=[output], help="Smells introduced since a baseline run")
+    new_smells.add_argument("--run", type=int, default=None, help="Run id (default: latest)")
+    new_smells.add_argument("--baseline", type=int, default=None, help="Baseline run id (default: the run before)")
+
+    regressions = commands.add_parser("regressions", parents=[output], help="Functions whose complexity grew since a baseline run")
+    regressions.add_argument("--run", type=int, default=None, help="Run id (default: latest)")
+    regressions.add_argument("--baseline", type=int, default=None, help="Baseline run id (default: the run before)")
+    regressions.add_argument("--limit", "-n", type=int, default=20)
+
+    args = parser.parse_args()
+
+    history = HistoryDatabase(args.database)
+    if args.command == "runs":
+        rows = history.runs(args.limit)
+        columns = ["id", "started_at", "git_revision", "tier", "total_files", "total_lines", "maintainability_index"]
+    elif args.command == "worst":
+        rows = history.worst_functions(args.run, args.limit)
+        columns = ["complexity", "path", "class_name", "name", "type"]
+    elif args.command == "trend":
+        rows = history.file_trend(args.path, args.limit)
+        columns = ["run_id", "started_at", "loc", "maintainability_index", "max_complexity", "smell_count"]
+    elif args.command == "new-smells":
+        rows = history.new_smells(args.run, args.baseline)
+        columns = ["path", "line", "type", "message"]
+    else:
+        rows = history.complexity_changes(args.run, args.baseline, args.limit)
+        columns = ["delta", "before", "after", "path", "class_name", "name"]
+    history.close()
+
+    if args.json:
+        json.dump(rows, sys.stdout, indent=2)
+        print()
+    else:
+        print_table(rows, columns)
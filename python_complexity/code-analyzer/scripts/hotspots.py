@@ -0,0 +1,218 @@
+import os
+import re
+import sys
+import json
+import bisect
+import argparse
+from collections import defaultdict
+
+from complexity_history import print_table
+
+
+class FunctionIndex:
+    """
+    The functions of a complexity report, indexed for joining with runtime
+    profiles. Script profiles are matched by (file name, function name,
+    first line) with a fallback on (file name, function name) when that is
+    unique; notebook profiles, which time lines within cells, are matched
+    by bisecting the line into the sorted function spans of its cell.
+    Every profile entry costs a lookup, never a scan of the report.
+    """
+
+    def __init__(self, report):
+        self.by_definition = defaultdict(list)
+        self.by_name = defaultdict(list)
+        self.paths = {}
+        spans = defaultdict(list)
+        for file_data in report["files"]:
+            self.paths.setdefault(file_data["fileName"], file_data["path"])
+            for entry in file_data["complexity"]:
+                if "line" not in entry:
+                    continue  # reports written before functions carried their lines
+                function = {
+                    "path": file_data["path"],
+                    "name": entry["name"],
+                    "class": entry.get("class"),
+                    "line": entry["line"],
+                    "complexity": entry["value"]
+                }
+                self.by_definition[(file_data["fileName"], entry["name"], entry["line"])].append(function)
+                self.by_name[(file_data["fileName"], entry["name"])].append(function)
+                if "cell" in entry:
+                    function["cell"] = entry["cell"]
+                    function["cellLine"] = entry["cellLine"]
+                    function["cellEndLine"] = entry["cellLine"] + entry["endLine"] - entry["line"]
+                    spans[(file_data["fileName"], entry["cell"])].append(function)
+
+        self.cell_spans = {}
+        for key, functions in spans.items():
+            functions.sort(key=lambda function: function["cellLine"])
+            self.cell_spans[key] = ([function["cellLine"] for function in functions], functions)
+
+    def match_definition(self, file_name, name, line):
+        """Functions a profiler entry refers to; more than one means the file name is ambiguous"""
+        matches = self.by_definition.get((file_name, name, line))
+        if not matches:
+            candidates = self.by_name.get((file_name, name), [])
+            matches = candidates if len(candidates) == 1 else []
+        return matches
+
+    def function_at(self, file_name, cell, line):
+        """Innermost function of a notebook whose span contains `line` of `cell`, or None"""
+        starts, functions = self.cell_spans.get((file_name, cell), ((), ()))
+        position = bisect.bisect_right(starts, line) - 1
+        # Spans nest, so the closest start at or before the line that still contains it is the innermost
+        while position >= 0:
+            function = functions[position]
+            if function["cellEndLine"] >= line:
+                return function
+            position -= 1
+        return None
+
+
+def _hotspot(function, runtime, share, calls, profile):
+    hotspot = dict(function)
+    hotspot.pop("cellEndLine", None)
+    hotspot.update({
+        "calls": calls,
+        "runtime": runtime,
+        "runtimeShare": round(share, 6),
+        "score": round(share * function["complexity"] * calls, 6),
+        "profile": profile
+    })
+    return hotspot
+
+
+def join_script_profile(index, stats, profile):
+    """
+    Join function_statistics.json ("file.py:function:first_line" -> calls,
+    total_time, ...) with the report. Returns the hotspots and the profile
+    keys that matched no function.
+    """
+    # Times are inclusive of callees, so the outermost function's time stands for the whole run
+    total_time = max((entry.get("total_time", 0) for entry in stats.values()), default=0)
+    hotspots = []
+    unmatched = []
+    for key, entry in stats.items():
+        try:
+            file_name, name, line = key.rsplit(":", 2)
+            line = int(line)
+        except ValueError:
+            unmatched.append(key)
+            continue
+        matches = index.match_definition(file_name, name, line)
+        if not matches:
+            unmatched.append(key)
+            continue
+        share = entry.get("total_time", 0) / total_time if total_time else 0
+        for function in matches:
+            hotspot = _hotspot(function, entry.get("total_time", 0), share, entry.get("calls", 0), profile)
+            if len(matches) > 1:
+                hotspot["ambiguous"] = True
+            hotspots.append(hotspot)
+    return hotspots, unmatched
+
+
+def join_notebook_profile(index, notebook_profile, profile):
+    """
+    Join a notebook profiler output (time and hits per line of each cell)
+    with the report. Line times add up per enclosing function, whose call
+    count is the most hits any of its lines saw. Lines outside functions
+    add up per cell, as a cell-level entry of complexity 1.
+    """
+    notebook_path = notebook_profile.get("metadata", {}).get("notebook_path") or profile
+    file_name = re.split(r"[\\/]", notebook_path)[-1]
+    if not file_name.endswith(".ipynb"):
+        file_name = re.sub(r"_profile\.json$", ".ipynb", os.path.basename(profile))
+
+    cells = notebook_profile.get("cells", {})
+    total_time = sum(cell.get("total_time", 0) for cell in cells.values())
+    totals = {}
+    for cell_key, cell in cells.items():
+        cell_index = int(cell_key)
+        for line_key, line in cell.get("lines", {}).items():
+            function = index.function_at(file_name, cell_index, int(line_key))
+            if function is None:
+                key = ("cell", cell_index)
+                function = {"path": index.paths.get(file_name, file_name), "name": f"<cell {cell_index}>",
+                            "class": None, "line": None, "complexity": 1, "cell": cell_index, "cellLine": 1}
+            else:
+                key = ("function", id(function))
+            runtime, calls, _ = totals.get(key, (0, 0, function))
+            totals[key] = (runtime + line.get("time", 0), max(calls, line.get("hits", 0)), function)
+
+    hotspots = []
+    for runtime, calls, function in totals.values():
+        share = runtime / total_time if total_time else 0
+        hotspots.append(_hotspot(function, runtime, share, calls, profile))
+    unmatched = [] if file_name in index.paths else [file_name]
+    return hotspots, unmatched
+
+
+def fuse(report, profile_paths):
+    """Rank the functions of `report` across all profiles, highest score first"""
+    index = FunctionIndex(report)
+    hotspots = []
+    unmatched = {}
+    for profile_path in profile_paths:
+        with open(profile_path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+        name = os.path.basename(profile_path)
+        if "cells" in profile and "metadata" in profile:
+            found, missing = join_notebook_profile(index, profile, name)
+        else:
+            found, missing = join_script_profile(index, profile, name)
+        hotspots.extend(found)
+        if missing:
+            unmatched[name] = missing
+
+    hotspots.sort(key=lambda hotspot: (-hotspot["score"], -hotspot["runtimeShare"], hotspot["path"],
+                                       hotspot["line"] or 0))
+    for rank, hotspot in enumerate(hotspots, 1):
+        hotspot["rank"] = rank
+    return {
+        "projectName": report.get("projectName", ""),
+        "profiles": [os.path.basename(path) for path in profile_paths],
+        "hotspots": hotspots,
+        "unmatched": unmatched
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rank functions to optimize first: runtime share x cyclomatic complexity x call count")
+    parser.add_argument("report", help="complexity_report.json, or the directory that contains it")
+    parser.add_argument("profiles", nargs="+",
+                        help="function_statistics.json from the script profiler and/or <notebook>_profile.json files")
+    parser.add_argument("--output", "-o", default=None,
+                        help="Where to write the ranking (default: hotspots.json next to the report)")
+    parser.add_argument("--top", "-n", type=int, default=20, help="Number of hotspots to print")
+    parser.add_argument("--json", action="store_true", help="Print the top hotspots as JSON")
+    args = parser.parse_args()
+
+    report_path = args.report
+    if os.path.isdir(report_path):
+        report_path = os.path.join(report_path, "complexity_report.json")
+    try:
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        result = fuse(report, args.profiles)
+    except (OSError, ValueError, KeyError) as e:
+        sys.exit(f"Cannot build the hotspot ranking: {e}")
+
+    output_path = args.output or os.path.join(os.path.dirname(os.path.abspath(report_path)), "hotspots.json")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+
+    top = result["hotspots"][:args.top]
+    if args.json:
+        print(json.dumps(top, indent=2))
+    else:
+        rows = [dict(hotspot, location=f"{hotspot['path']}:" + (
+            f"cell {hotspot['cell']} line {hotspot['cellLine']}" if "cell" in hotspot else str(hotspot["line"])),
+            function=f"{hotspot['class']}.{hotspot['name']}" if hotspot["class"] else hotspot["name"])
+            for hotspot in top]
+        print_table(rows, ["rank", "score", "runtimeShare", "complexity", "calls", "function", "location"])
+        for name, keys in result["unmatched"].items():
+            print(f"{name}: {len(keys)} entries matched no function in the report")
+        print(f"\nHotspot ranking saved to: {output_path}")
@@ -0,0 +1,62 @@
+import ast
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "scripts"))
+
+from complexity_checker import PerformanceVisitor  # noqa: E402
+
+
+def findings(code):
+    visitor = PerformanceVisitor()
+    visitor.visit(ast.parse(code))
+    return [(kind, detail) for kind, _, _, _, detail, _, _ in visitor.findings]
+
+
+def test_len_of_subscript_indexed_by_loop_target_is_not_reported():
+    code = (
+        "def total(m, keys):\n"
+        "    for k in keys:\n"
+        "        n = len(m[k])\n"
+    )
+    assert findings(code) == []
+
+
+def test_len_of_subscript_indexed_by_comprehension_target_is_not_reported():
+    code = (
+        "def total(d, xs):\n"
+        "    return sum(len(d[x]) for x in xs)\n"
+    )
+    assert findings(code) == []
+
+
+def test_loop_invariant_len_is_reported():
+    code = (
+        "def total(m, keys):\n"
+        "    for k in keys:\n"
+        "        n = len(m)\n"
+    )
+    assert findings(code) == [("Repeated Lookup In Loop", "len(m) recomputed inside a loop")]
+
+
+def test_tree_walk_rebinding_the_loop_variable_is_not_nested_over_the_same_collection():
+    code = (
+        "class Node:\n"
+        "    def leaves(self):\n"
+        "        for token in self:\n"
+        "            for token in token:\n"
+        "                for token in token:\n"
+        "                    yield token\n"
+    )
+    assert findings(code) == []
+
+
+def test_nested_loops_over_the_same_collection_are_reported():
+    code = (
+        "def pairs(grid):\n"
+        "    for row in grid:\n"
+        "        for a in row:\n"
+        "            for b in row:\n"
+        "                yield a, b\n"
+    )
+    assert findings(code) == [("Nested Loops Over Same Collection", "nested loops over row")]